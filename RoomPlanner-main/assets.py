@@ -0,0 +1,155 @@
+# Sprite atlas used by the Room Planner.
+# Desc: Decoding the furniture PNGs used to be most of the planner's startup, so their pixels are kept pre-decoded in
+#       one atlas file (Graphics/atlas.bin). It holds each sprite's raw RGBA pixels back to back, plus the small
+#       furniture panel thumbnails, and turning one into a surface needs no decoding at all. The atlas remembers the
+#       size and modification time of every PNG it was built from, and is rebuilt when one of them changes (or when
+#       the atlas is missing, damaged, or holds a different list of sprites). Only the sprites the planner names go
+#       in, so PNGs nothing uses (like Lamp1.png) are never decoded.
+#       Startup only makes the panel thumbnails, which is all the first frame draws. After that a background thread
+#       reads the full-size sprites in while the planner waits for input, and each one becomes a surface the first
+#       time it's asked for. The thread only reads bytes, every pygame call stays on the main thread.
+#
+# File layout:
+#   b'RPAT', uint16 format version, uint32 header length, then a JSON header
+#   {"sources": {sprite: [png size, png mtime_ns]}, "thumbnails": [[sprite, scale], ...],
+#    "sprites": {key: [offset, width, height]}}
+#   and then the pixels, offsets counted from the end of the header
+
+import json
+import os
+import struct
+import threading
+
+import pygame
+
+ATLAS_MAGIC = b'RPAT'
+ATLAS_VERSION = 1
+ATLAS_NAME = 'atlas.bin'
+HEADER_FORMAT = '<4sHI'
+
+
+def thumbnail_key(name, scale) -> str:  # an atlas key for a pre-scaled copy, e.g. 'Bed@0.3'
+    return '{}@{}'.format(name, scale)
+
+
+class SpriteAtlas:
+    def __init__(self, graphics_dir, names, thumbnails, path=None):
+        self.graphics_dir = graphics_dir
+        self.names = list(names)  # PNG names without the extension
+        self.thumbnails = [[name, scale] for name, scale in thumbnails]  # (sprite, scale_by factor) pairs
+        self.path = path or os.path.join(graphics_dir, ATLAS_NAME)
+        self.sprites = {}  # key -> (offset, width, height)
+        self.data_start = 0  # where the pixels start in the file
+        self.pixels = {}  # key -> RGBA bytes that were read (or built) but haven't been made into a surface yet
+        self.made = set()  # keys already handed out as surfaces, so the streaming thread can skip them
+        self.lock = threading.Lock()
+        self.stream_thread = None
+        self.rebuilt = False  # whether open() had to decode the PNGs
+
+    def open(self) -> None:  # reads the atlas's index, rebuilding the atlas first if it's out of date
+        stamps = self.source_stamps()
+        if not self.read_header(stamps):
+            self.build(stamps)
+
+    def source_stamps(self) -> dict:  # sprite -> [size, mtime_ns] of its PNG
+        stamps = {}
+        for name in self.names:
+            stat = os.stat(self.png_path(name))
+            stamps[name] = [stat.st_size, stat.st_mtime_ns]
+        return stamps
+
+    def png_path(self, name) -> str:
+        return os.path.join(self.graphics_dir, name + '.png')
+
+    def read_header(self, stamps) -> bool:  # False if the atlas is missing, stale or doesn't look right
+        try:
+            with open(self.path, 'rb') as file:
+                magic, version, header_length = struct.unpack(HEADER_FORMAT, file.read(struct.calcsize(HEADER_FORMAT)))
+                if magic != ATLAS_MAGIC or version != ATLAS_VERSION:
+                    return False
+                header = json.loads(file.read(header_length))
+                data_start = file.tell()
+                file_size = os.fstat(file.fileno()).st_size
+        except (OSError, ValueError, struct.error):
+            return False
+        if header.get('sources') != stamps or header.get('thumbnails') != self.thumbnails:
+            return False
+        sprites = {key: tuple(entry) for key, entry in header['sprites'].items()}
+        if any(data_start + offset + width * height * 4 > file_size for offset, width, height in sprites.values()):
+            return False  # cut short, e.g. by a crash while it was being written
+        self.sprites = sprites
+        self.data_start = data_start
+        return True
+
+    def build(self, stamps) -> None:
+        # decodes every PNG once, and keeps the pixels so this session doesn't have to read them back from the file.
+        # thumbnails are made exactly the way the panel used to make them, from the converted full-size image
+        images = {name: pygame.image.load(self.png_path(name)).convert_alpha() for name in self.names}
+        pixels = {name: (pygame.image.tobytes(image, 'RGBA'), image.get_size()) for name, image in images.items()}
+        for name, scale in self.thumbnails:
+            thumbnail = pygame.transform.scale_by(images[name], scale)
+            pixels[thumbnail_key(name, scale)] = (pygame.image.tobytes(thumbnail, 'RGBA'), thumbnail.get_size())
+        offset = 0
+        for key, (data, (width, height)) in pixels.items():
+            self.sprites[key] = (offset, width, height)
+            self.pixels[key] = data
+            offset += len(data)
+        self.rebuilt = True
+
+        header = json.dumps({'sources': stamps, 'thumbnails': self.thumbnails,
+                             'sprites': {key: list(entry) for key, entry in self.sprites.items()}}).encode()
+        temp_path = '{}.{}.tmp'.format(self.path, os.getpid())  # several export workers may rebuild at once
+        try:
+            with open(temp_path, 'wb') as file:
+                file.write(struct.pack(HEADER_FORMAT, ATLAS_MAGIC, ATLAS_VERSION, len(header)))
+                file.write(header)
+                for data, _ in pixels.values():
+                    file.write(data)
+            os.replace(temp_path, self.path)
+        except OSError:  # e.g. a read-only install: this session keeps every sprite in memory instead
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            self.path = None
+
+    def read_pixels(self, file, key) -> bytes:
+        offset, width, height = self.sprites[key]
+        file.seek(self.data_start + offset)
+        return file.read(width * height * 4)
+
+    def image(self, name) -> pygame.Surface:  # a new surface for a sprite or thumbnail key, converted for fast blits
+        if name not in self.sprites:  # not packed (or no atlas opened), straight from its PNG
+            return pygame.image.load(self.png_path(name)).convert_alpha()
+        if self.path is None:  # the atlas couldn't be saved, build() left everything in pixels
+            data = self.pixels[name]
+        else:
+            with self.lock:
+                data = self.pixels.pop(name, None)
+                self.made.add(name)
+        if data is None:  # not streamed in yet
+            with open(self.path, 'rb') as file:
+                data = self.read_pixels(file, name)
+        _, width, height = self.sprites[name]
+        return pygame.image.frombuffer(data, (width, height), 'RGBA').convert_alpha()
+
+    def thumbnail(self, name, scale) -> pygame.Surface:
+        return self.image(thumbnail_key(name, scale))
+
+    def start_streaming(self) -> None:  # starts reading every full-size sprite that hasn't been used yet
+        if self.stream_thread is None and self.sprites and self.path is not None:
+            self.stream_thread = threading.Thread(target=self.stream, name='atlas-stream', daemon=True)
+            self.stream_thread.start()
+
+    def stream(self) -> None:
+        with open(self.path, 'rb') as file:
+            for name in self.names:
+                with self.lock:
+                    if name in self.made or name in self.pixels:
+                        continue
+                data = self.read_pixels(file, name)
+                with self.lock:
+                    if name not in self.made:
+                        self.pixels[name] = data
+
+    def wait_streaming(self) -> None:
+        if self.stream_thread is not None:
+            self.stream_thread.join()
@@ -0,0 +1,431 @@
+# Room Planner benchmark and replay harness
+# Desc: Runs the planner headless (SDL's dummy video driver) and feeds it a recorded or synthetic stream of mouse
+#       events, timing every frame. Reports frame-time percentiles, events/sec and peak memory, and has a suite
+#       that scales the room size and furniture count so performance regressions show up before a build ships.
+#
+# Usage:
+#   python benchmark.py suite [--furniture 10,100,500] [--vertices 6,50,200]
+#   python benchmark.py synthetic --furniture 100 --vertices 6 [--save stream.json]
+#   python benchmark.py --rooms 200 synthetic    (same edits, on a floor with 199 other rooms)
+#   python benchmark.py replay stream.json
+#   python benchmark.py layout [--furniture 1000,10000,50000]
+#   python benchmark.py plan [--furniture 1000,10000,50000]
+#   python benchmark.py startup [--runs 5] [--rebuild-atlas]    (cold start to first frame, each in a new process)
+#   python benchmark.py --profile --trace trace.json synthetic    (per-phase times, and a trace for chrome://tracing)
+#   python benchmark.py record stream.json      (opens the normal window and records what you do)
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pygame
+
+import main as planner
+from profiler import percentile
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+EVENT_TYPES = {'MOUSEBUTTONDOWN': pygame.MOUSEBUTTONDOWN, 'MOUSEBUTTONUP': pygame.MOUSEBUTTONUP,
+               'MOUSEMOTION': pygame.MOUSEMOTION}
+EVENT_NAMES = {value: key for key, value in EVENT_TYPES.items()}
+CLICKS_PER_FRAME = 10  # how many "add furniture" clicks the synthetic stream packs into one frame
+ROOM_SPACING = 500  # world pixels between the extra rooms added by --rooms
+PIECES_PER_ROOM = 250  # furniture per room in the save/load benchmark
+
+
+def event_to_dict(event) -> dict:
+    data = {'type': EVENT_NAMES[event.type], 'pos': list(event.pos)}
+    if event.type == pygame.MOUSEMOTION:
+        data['rel'] = list(event.rel)
+    else:
+        data['button'] = event.button
+    return data
+
+
+def dict_to_event(data) -> pygame.event.Event:
+    attributes = {'pos': tuple(data['pos'])}
+    if 'rel' in data:
+        attributes['rel'] = tuple(data['rel'])
+        attributes['buttons'] = (1, 0, 0)
+    else:
+        attributes['button'] = data['button']
+    return pygame.event.Event(EVENT_TYPES[data['type']], attributes)
+
+
+def save_stream(frames, path) -> None:  # a stream is a list of frames, each a list of events handled in that frame
+    with open(path, 'w') as file:
+        json.dump([[event_to_dict(event) for event in frame] for frame in frames], file)
+
+
+def load_stream(path) -> list:
+    with open(path) as file:
+        return [[dict_to_event(data) for data in frame] for frame in json.load(file)]
+
+
+def click(pos) -> list:
+    return [[pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1)],
+            [pygame.event.Event(pygame.MOUSEBUTTONUP, pos=pos, button=1)]]
+
+
+def drag(start, rels) -> list:  # press at start, one motion event per frame, release where the mouse ended up
+    frames = [[pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=start, button=1)]]
+    x, y = start
+    for rel in rels:
+        x += rel[0]
+        y += rel[1]
+        frames.append([pygame.event.Event(pygame.MOUSEMOTION, pos=(x, y), rel=rel, buttons=(1, 0, 0))])
+    frames.append([pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(x, y), button=1)])
+    return frames
+
+
+def synthetic_stream(app, furniture_count, vertex_count, drag_steps=30):
+    # generator, since where to click depends on where the previous events left things (furniture spawns randomly)
+    ui = app.ui
+    for _ in range(max(0, vertex_count - len(app.room.wall_vertices))):
+        yield from click(ui.btn_add_vertex_rect.center)
+
+    buttons = [ui.btn_bed_rect, ui.btn_desk_rect, ui.btn_nightstand_rect, ui.btn_rug_rect, ui.btn_dresser_rect,
+               ui.btn_chair_rect, ui.btn_tv_rect, ui.btn_lamp_rect, ui.btn_door_rect, ui.btn_window_rect]
+    for first in range(0, furniture_count, CLICKS_PER_FRAME):
+        frame = []
+        for i in range(first, min(furniture_count, first + CLICKS_PER_FRAME)):
+            pos = buttons[i % len(buttons)].center
+            frame.append(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1))
+            frame.append(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=pos, button=1))
+        yield frame
+
+    for vertex in app.room.wall_vertices[:3]:  # drag a few corners around
+        yield from drag(vertex.rect.center, [(3, 2)] * drag_steps + [(-2, -3)] * drag_steps)
+
+    if not app.room.furniture_pieces:
+        return
+    yield from drag(app.room.furniture_pieces[-1].rect.center, [(4, 1)] * drag_steps + [(-1, 4)] * drag_steps)
+    yield from click(app.room.furniture_pieces[-1].rect.center)  # make sure the overlay is showing
+
+    piece = app.room.furniture_pieces[-1]
+    center = piece.rect.center
+    radius = math.hypot(piece.rotate_btn_rect.centerx - center[0], piece.rotate_btn_rect.centery - center[1])
+    start = piece.rotate_btn_rect.center
+    rels = []
+    last = start
+    for step in range(1, drag_steps + 1):  # swing the rotate handle a quarter turn around the piece
+        angle = math.atan2(start[1] - center[1], start[0] - center[0]) + step * (math.pi / 2) / drag_steps
+        point = (round(center[0] + radius * math.cos(angle)), round(center[1] + radius * math.sin(angle)))
+        rels.append((point[0] - last[0], point[1] - last[1]))
+        last = point
+    yield from drag(start, rels)
+
+    yield from click(app.room.furniture_pieces[-1].rect.center)
+    yield from drag(app.room.furniture_pieces[-1].width_btn_rect.center, [(2, 0)] * drag_steps)
+    yield from click(app.room.furniture_pieces[-1].rect.center)
+    yield from drag(app.room.furniture_pieces[-1].height_btn_rect.center, [(0, -2)] * drag_steps)
+
+
+def peak_rss_mb():  # peak resident memory of the whole process, SDL surfaces included
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # ru_maxrss is in KiB on Linux
+
+
+def replay(app, frames, trace_memory=False) -> dict:
+    # feeds each frame's events through the planner and renders it, exactly like one pass of RoomPlanner.run(),
+    # minus the 75 fps cap and the blocking wait
+    if trace_memory:
+        tracemalloc.start()
+    frame_times = []
+    event_count = 0
+    start = time.perf_counter()
+    for frame in frames:
+        frame_start = time.perf_counter()
+        app.process_frame(frame)
+        frame_times.append(time.perf_counter() - frame_start)
+        event_count += len(frame)
+    total = time.perf_counter() - start
+    python_peak = None
+    if trace_memory:
+        python_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    frame_times.sort()
+    return {'frames': len(frame_times), 'events': event_count, 'seconds': total,
+            'events_per_sec': event_count / total if total else 0.0,
+            'p50_ms': percentile(frame_times, .5) * 1000, 'p90_ms': percentile(frame_times, .9) * 1000,
+            'p99_ms': percentile(frame_times, .99) * 1000,
+            'max_ms': frame_times[-1] * 1000 if frame_times else 0.0,
+            'python_peak_mb': python_peak, 'peak_rss_mb': peak_rss_mb()}
+
+
+def format_result(label, result) -> str:
+    memory = 'peak rss {:.1f} MB'.format(result['peak_rss_mb']) if result['peak_rss_mb'] is not None else ''
+    if result['python_peak_mb'] is not None:
+        memory += ', python peak {:.1f} MB'.format(result['python_peak_mb'])
+    return ('{:<24} {:>6} frames {:>7} events {:>10.0f} ev/s   p50 {:>7.2f} ms  p90 {:>7.2f} ms  '
+            'p99 {:>7.2f} ms  max {:>7.2f} ms   {}').format(label, result['frames'], result['events'],
+                                                         result['events_per_sec'], result['p50_ms'],
+                                                         result['p90_ms'], result['p99_ms'], result['max_ms'],
+                                                         memory)
+
+
+def add_neighbour_rooms(app, room_count, pieces_per_room=4) -> None:
+    # fills the floor with square furnished rooms in a grid to the right of the one being edited, so runs with
+    # --rooms show whether editing one room gets slower as the floor grows
+    state = random.getstate()  # leave the random sequence alone, so the edited room looks the same at any size
+    columns = max(1, math.ceil(math.sqrt(room_count)))
+    for i in range(room_count):
+        left = 1600 + (i % columns) * ROOM_SPACING
+        top = (i // columns) * ROOM_SPACING
+        size = ROOM_SPACING - 100
+        room = planner.Room([(left, top), (left + size, top), (left + size, top + size), (left, top + size)])
+        for j in range(pieces_per_room):
+            piece = planner.Furniture(planner.FURNITURE_TYPES[(i + j) % len(planner.FURNITURE_TYPES)])
+            piece.rect.center = (left + size // 2, top + size // 2)
+            room.add_furniture(piece)
+        app.floor.add_room(room)
+    random.setstate(state)
+
+
+def format_phases() -> str:  # the profiler's per-phase p50/p99 for the run that just finished
+    return '\n'.join('    {:<22} p50 {:>7.3f} ms  p99 {:>7.3f} ms  ({} samples)'.format(name, p50, p99, samples)
+                     for name, (p50, p99, samples) in planner.profiler.summary().items())
+
+
+def report(label, result, args) -> None:
+    print(format_result(label, result))
+    if args.profile or args.trace:
+        print(format_phases())
+    if args.trace:
+        print('    wrote {} trace events to {}'.format(planner.profiler.export_chrome_trace(args.trace), args.trace))
+
+
+def new_planner(args) -> planner.RoomPlanner:
+    planner.profiler.enabled = args.profile or bool(args.trace)
+    planner.profiler.reset()
+    app = planner.RoomPlanner()
+    app.dirty_rect_rendering = not args.full_redraw
+    app.progressive_quality = not args.no_progressive
+    app.live_collisions = not args.no_collisions
+    add_neighbour_rooms(app, args.rooms - 1)
+    return app
+
+
+def run_synthetic(furniture_count, vertex_count, args, recorded_frames=None) -> dict:
+    random.seed(args.seed)  # furniture spawns at random spots, keep runs comparable
+    app = new_planner(args)
+    frames = synthetic_stream(app, furniture_count, vertex_count, args.drag_steps)
+    if recorded_frames is not None:
+        frames = keep_frames(frames, recorded_frames)
+    return replay(app, frames, args.trace_memory)
+
+
+def keep_frames(frames, recorded_frames):  # passes frames through while saving a copy of each one
+    for frame in frames:
+        recorded_frames.append(frame)
+        yield frame
+
+
+def run_layout_checks(furniture_count, args) -> str:
+    # times the batch layout queries on a room full of randomly scattered pieces
+    random.seed(args.seed)
+    room = planner.Room()
+    side = int(math.sqrt(furniture_count) * 150)  # room grows with the furniture count so density stays similar
+    for ind, corner in enumerate([(0, 0), (side, 0), (side, side), (side // 2, side), (side // 2, side // 2),
+                                  (0, side // 2)]):
+        room.wall_vertices[ind].rect.center = corner
+        room.vertex_moved(ind)
+    for i in range(furniture_count):
+        piece = planner.Furniture(planner.FURNITURE_TYPES[i % len(planner.FURNITURE_TYPES)])
+        piece.rect.center = (random.randint(0, side), random.randint(0, side))
+        room.add_furniture(piece)
+
+    timings = []
+    for query in (room.overlapping_furniture, room.furniture_crossing_walls, room.furniture_outside_room):
+        start = time.perf_counter()
+        found = len(query())
+        timings.append('{} {:.1f} ms ({} found)'.format(query.__name__, (time.perf_counter() - start) * 1000, found))
+    return '{:<10} pieces   '.format(furniture_count) + '   '.join(timings)
+
+
+def run_plan_files(furniture_count, args) -> str:
+    # times saving and reopening a floor with furniture_count pieces spread over rooms of PIECES_PER_ROOM, in both
+    # formats, plus the first frame drawn after opening (which is when the visible pieces get their images)
+    random.seed(args.seed)
+    app = new_planner(args)
+    room_count = max(1, math.ceil(furniture_count / PIECES_PER_ROOM))
+    add_neighbour_rooms(app, room_count, min(furniture_count, PIECES_PER_ROOM))
+    app.floor.remove_room(app.room)  # keep just the generated rooms, so the piece count is exact
+    extra = sum(len(room.furniture_pieces) for room in app.floor.rooms) - furniture_count
+    for room in app.floor.rooms[:extra]:
+        room.delete_furniture(0)
+
+    timings = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ('plan.rplan', 'plan.json'):
+            path = os.path.join(directory, name)
+            start = time.perf_counter()
+            planner.save_building(app.building, path)
+            saved = time.perf_counter()
+            loaded = new_planner(args)
+            loaded.open_plan(path)
+            opened = time.perf_counter()
+            loaded.render()
+            timings.append('{} {:.2f} MB save {:.0f} ms open {:.0f} ms first frame {:.0f} ms'.format(
+                name.split('.')[1], os.path.getsize(path) / (1024 * 1024), (saved - start) * 1000,
+                (opened - saved) * 1000, (time.perf_counter() - opened) * 1000))
+    return '{:<10} pieces   '.format(furniture_count) + '   '.join(timings)
+
+
+def run_startup(args) -> None:
+    # launches the planner in a fresh interpreter per run, so imports, display setup and asset loading are all
+    # counted, and reports how long each step took from launch. --rebuild-atlas deletes the sprite atlas first, to
+    # time the run that has to decode the PNGs
+    first_frames = []
+    for run in range(args.runs):
+        if args.rebuild_atlas and run == 0 and os.path.exists(planner.atlas.path):
+            os.remove(planner.atlas.path)
+        launched = time.time()
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), 'startup', '--child'], check=True,
+                               capture_output=True, text=True, cwd=planner.ASSET_DIR)
+        marks = json.loads(child.stdout.strip().splitlines()[-1])
+        since_launch = {name: (marks[name] - launched) * 1000
+                        for name in ('imported', 'display', 'first_frame', 'streamed')}
+        first_frames.append(since_launch['first_frame'])
+        print('run {:<3} first frame {:>6.0f} ms  (python + imports {:.0f}, display + atlas {:.1f}, frame {:.1f})'
+              '   all sprites read {:.0f} ms{}'.format(run + 1, since_launch['first_frame'], since_launch['imported'],
+                                                     since_launch['display'] - since_launch['imported'],
+                                                     since_launch['first_frame'] - since_launch['display'],
+                                                     since_launch['streamed'],
+                                                     '   (atlas rebuilt from the PNGs)' if marks['rebuilt'] else ''))
+    first_frames.sort()
+    print('first frame p50 {:.0f} ms, max {:.0f} ms over {} runs'.format(percentile(first_frames, .5),
+                                                                       first_frames[-1], len(first_frames)))
+
+
+def startup_child() -> None:  # one timed start, run by run_startup() in its own process. prints wall-clock marks
+    imported = time.time()
+    planner.init_display(headless=True)
+    display = time.time()
+    app = planner.RoomPlanner()
+    app.process_frame([])  # what RoomPlanner.run() draws first
+    first_frame = time.time()
+    planner.atlas.start_streaming()
+    planner.atlas.wait_streaming()
+    print(json.dumps({'imported': imported, 'display': display, 'first_frame': first_frame, 'streamed': time.time(),
+                      'rebuilt': planner.atlas.rebuilt}))
+
+
+def int_list(text) -> list:
+    return [int(value) for value in text.split(',')]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Headless Room Planner benchmarks')
+    parser.add_argument('--full-redraw', action='store_true', help='redraw the whole screen every frame')
+    parser.add_argument('--no-progressive', action='store_true', help='full-quality transforms on every motion event')
+    parser.add_argument('--no-collisions', action='store_true', help='no live collision checks while dragging')
+    parser.add_argument('--trace-memory', action='store_true', help='also report peak Python heap (slower)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--drag-steps', type=int, default=30, help='motion events per synthetic drag')
+    parser.add_argument('--rooms', type=int, default=1, help='rooms on the floor (only the first one is edited)')
+    parser.add_argument('--profile', action='store_true', help='also report p50/p99 for each phase of the frame')
+    parser.add_argument('--trace', help='write a Chrome trace of every frame phase to this file')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    suite = commands.add_parser('suite', help='scale furniture count and room size')
+    suite.add_argument('--furniture', type=int_list, default=[10, 100, 500])
+    suite.add_argument('--vertices', type=int_list, default=[6, 50, 200])
+
+    synthetic = commands.add_parser('synthetic', help='run one synthetic scenario')
+    synthetic.add_argument('--furniture', type=int, default=100)
+    synthetic.add_argument('--vertices', type=int, default=6)
+    synthetic.add_argument('--save', help='also write the generated event stream to this file')
+
+    replay_command = commands.add_parser('replay', help='replay a recorded event stream')
+    replay_command.add_argument('path')
+
+    layout = commands.add_parser('layout', help='time the batch overlap/wall/containment checks')
+    layout.add_argument('--furniture', type=int_list, default=[1000, 10000, 50000])
+
+    plan_files = commands.add_parser('plan', help='time saving and opening plans in both formats')
+    plan_files.add_argument('--furniture', type=int_list, default=[1000, 10000, 50000])
+
+    startup = commands.add_parser('startup', help='time cold starts up to the first frame')
+    startup.add_argument('--runs', type=int, default=5)
+    startup.add_argument('--rebuild-atlas', action='store_true', help='delete the sprite atlas before the first run')
+    startup.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+
+    record = commands.add_parser('record', help='use the planner normally and record the events to a file')
+    record.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record_session(args.path)
+        return
+    if args.command == 'startup':
+        if args.child:
+            startup_child()
+        else:
+            run_startup(args)
+        return
+
+    planner.init_display(headless=True)
+    if args.command == 'suite':
+        for vertex_count in args.vertices:
+            for furniture_count in args.furniture:
+                result = run_synthetic(furniture_count, vertex_count, args)
+                report('{} verts, {} furn'.format(vertex_count, furniture_count), result, args)
+    elif args.command == 'layout':
+        for furniture_count in args.furniture:
+            print(run_layout_checks(furniture_count, args))
+    elif args.command == 'plan':
+        for furniture_count in args.furniture:
+            print(run_plan_files(furniture_count, args))
+    elif args.command == 'synthetic':
+        recorded_frames = [] if args.save else None
+        result = run_synthetic(args.furniture, args.vertices, args, recorded_frames)
+        report('{} verts, {} furn'.format(args.vertices, args.furniture), result, args)
+        if args.save:
+            save_stream(recorded_frames, args.save)
+    else:
+        random.seed(args.seed)
+        result = replay(new_planner(args), load_stream(args.path), args.trace_memory)
+        report(args.path, result, args)
+
+
+class RecordingPlanner(planner.RoomPlanner):  # a normal planner that also remembers which events each frame had
+    def __init__(self):
+        super().__init__()
+        self.frames = [[]]
+
+    def handle_event(self, event) -> None:
+        if event.type in EVENT_NAMES:
+            self.frames[-1].append(event)
+        super().handle_event(event)
+
+    def render(self) -> None:
+        super().render()
+        if self.frames[-1]:
+            self.frames.append([])
+
+
+def record_session(path) -> None:
+    planner.init_display()
+    app = RecordingPlanner()
+    try:
+        app.run()
+    finally:  # closing the window raises SystemExit out of run()
+        save_stream([frame for frame in app.frames if frame], path)
+        print('recorded {} frames to {}'.format(len(app.frames), path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# Multi-room building model used by the Room Planner.
+# Desc: A Building is a stack of Floors, and a Floor holds any number of Rooms. The floor keeps every room's bounds
+#       (outline plus furniture) in a spatial grid, so clicks and redraws only reach the rooms near them. Each room
+#       keeps its own indexes and geometry cache, so editing one room never touches the others.
+
+import pygame
+
+from spatial_index import SpatialGrid
+
+ROOM_CELL_SIZE = 512  # world pixels per cell of the room index, about one room across
+
+
+class Floor:
+    def __init__(self, rooms=()):
+        self.rooms = []  # drawing order, bottom to top
+        self.room_index = SpatialGrid(ROOM_CELL_SIZE)
+        self.next_z = 0
+        self.scene = None  # the scene.Scene the rooms are published to, if any
+        for room in rooms:
+            self.add_room(room)
+
+    def __len__(self) -> int:
+        return len(self.rooms)
+
+    def add_room(self, room) -> None:
+        self.rooms.append(room)
+        self.room_index.insert(room, room.bounds(), self.next_z)
+        self.next_z += 1
+        if self.scene is not None:
+            room.publish(self.scene)
+
+    def remove_room(self, room) -> None:
+        self.rooms.remove(room)
+        self.room_index.remove(room)
+        room.unpublish()
+
+    def publish(self, scene) -> None:
+        # mirrors every room and piece into a scene.Scene and keeps it up to date, so another frontend (like the
+        # Tk renderer) can show the floor while it's being edited here
+        self.scene = scene
+        for room in self.rooms:
+            room.publish(scene)
+
+    def room_changed(self, room) -> None:  # call after a room's walls or furniture change
+        self.room_index.update(room, room.bounds())
+
+    def rooms_in(self, rect) -> list:  # rooms whose bounds overlap the world rect, bottom to top
+        return [room for _, room in self.room_index.query(rect)]
+
+    def room_containing(self, point):  # topmost room whose walls enclose the world point, or None
+        for room in reversed(self.rooms_in(pygame.Rect(point[0], point[1], 1, 1))):
+            if room.geometry.contains(point):
+                return room
+        return None
+
+    def vertex_at(self, pos, radius) -> tuple:  # (room, vertex index) of the topmost vertex near pos, or (None, -1)
+        area = pygame.Rect(int(pos[0] - radius) - 1, int(pos[1] - radius) - 1, int(radius * 2) + 3,
+                           int(radius * 2) + 3)
+        for room in reversed(self.rooms_in(area)):
+            ind = room.vertex_at(pos, radius)
+            if ind != -1:
+                return room, ind
+        return None, -1
+
+    def furniture_at(self, pos) -> tuple:  # (room, furniture index) of the topmost piece under pos, or (None, -1)
+        for room in reversed(self.rooms_in(pygame.Rect(int(pos[0]) - 1, int(pos[1]) - 1, 3, 3))):
+            ind = room.furniture_at(pos)
+            if ind != -1:
+                return room, ind
+        return None, -1
+
+    def add_furniture(self, furn_object, fallback_room):
+        # puts a new piece in the room it landed in (or fallback_room if it's outside every room), returns that room
+        room = self.room_containing(furn_object.rect.center) or fallback_room
+        room.add_furniture(furn_object)
+        self.room_changed(room)
+        return room
+
+    def reassign_furniture(self, furn_object, room):
+        # moves a piece that was dropped into a different room over to that room (on top), returns its room now
+        new_room = self.room_containing(furn_object.rect.center)
+        if new_room is None or new_room is room:
+            return room
+        room.delete_furniture(room.piece_index(furn_object))
+        new_room.add_furniture(furn_object)
+        self.room_changed(room)
+        self.room_changed(new_room)
+        return new_room
+
+    @property
+    def area(self) -> float:  # square inches over every room
+        return sum(room.area for room in self.rooms)
+
+    @property
+    def perimeter(self) -> float:  # inches of wall over every room
+        return sum(room.perimeter for room in self.rooms)
+
+
+class Building:
+    def __init__(self, floors=None):
+        self.floors = list(floors) if floors else [Floor()]
+
+    def add_floor(self, floor=None) -> Floor:
+        self.floors.append(floor if floor is not None else Floor())
+        return self.floors[-1]
+
+    @property
+    def area(self) -> float:
+        return sum(floor.area for floor in self.floors)
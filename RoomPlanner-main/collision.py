@@ -0,0 +1,153 @@
+# Live collision and clearance checks used by the Room Planner.
+# Desc: While a piece is dragged, resized or rotated, finds what it runs into: other furniture, walls, and anything
+#       standing in its clearance zone (the square a door swings through). Each room's furniture grid picks out the
+#       few pieces whose rects are near it (the broad phase), and only those get the exact test: separating axes on
+#       the oriented boxes, so a rotated piece collides by its real outline instead of its bounding rect. Walls are
+#       tested as segments against the same boxes. The cost depends on how crowded the piece's surroundings are,
+#       not on how many pieces the floor holds.
+
+import math
+
+import numpy as np
+import pygame
+
+FLOOR_COVERINGS = {'Rug'}  # lie under other furniture, so they never collide with it
+WALL_MOUNTED = {'Door', 'Window'}  # sit in a wall, so crossing one is expected
+CLEARANCES = {'Door': 1.0}  # depth kept clear in front of a piece, as a fraction of its length (a door's swing)
+
+
+class Collisions:  # what check_piece() found, empty lists if the piece is clear
+    __slots__ = ('pieces', 'walls', 'zone', 'zone_pieces', 'zone_walls')
+
+    def __init__(self):
+        self.pieces = []  # other pieces the piece overlaps
+        self.walls = []  # (room, wall index) of walls running through the piece
+        self.zone = None  # corners of the piece's clearance zone, or None if its type doesn't need one
+        self.zone_pieces = []  # pieces standing in the clearance zone
+        self.zone_walls = []  # (room, wall index) of walls cutting through the clearance zone
+
+    def __bool__(self) -> bool:
+        return bool(self.pieces or self.walls or self.zone_pieces or self.zone_walls)
+
+
+def box_corners(center, size, angle) -> list:
+    # corners of a width x height box turned counterclockwise on screen by angle degrees (the way
+    # pygame.transform.rotate turns images), starting from the top left of the unturned box and going clockwise.
+    # the first edge is the box's front, which is where a clearance zone goes
+    cos_a = math.cos(math.radians(angle))
+    sin_a = math.sin(math.radians(angle))
+    half_width = size[0] / 2
+    half_height = size[1] / 2
+    return [(center[0] + x * cos_a + y * sin_a, center[1] - x * sin_a + y * cos_a)
+            for x, y in ((-half_width, -half_height), (half_width, -half_height), (half_width, half_height),
+                         (-half_width, half_height))]
+
+
+def front_zone(corners, depth) -> list:  # the box of the given depth in front of the first edge of box_corners()
+    edge_x = corners[0][0] - corners[3][0]  # along the side, pointing out of the front
+    edge_y = corners[0][1] - corners[3][1]
+    length = math.hypot(edge_x, edge_y) or 1.0
+    out_x = edge_x / length * depth
+    out_y = edge_y / length * depth
+    return [(corners[0][0] + out_x, corners[0][1] + out_y), (corners[1][0] + out_x, corners[1][1] + out_y),
+            corners[1], corners[0]]
+
+
+def bounding_rect(points) -> pygame.Rect:  # smallest whole-pixel rect around the points
+    xs = [point[0] for point in points]
+    ys = [point[1] for point in points]
+    left = math.floor(min(xs))
+    top = math.floor(min(ys))
+    return pygame.Rect(left, top, math.ceil(max(xs)) - left + 1, math.ceil(max(ys)) - top + 1)
+
+
+def polygons_overlap(poly_a, poly_b) -> bool:
+    # separating axis test for convex polygons (a 2-point polygon is a segment). touching edges don't count,
+    # same as pygame.Rect.colliderect
+    for poly in (poly_a, poly_b):
+        for ind in range(len(poly)):
+            x1, y1 = poly[ind - 1]
+            x2, y2 = poly[ind]
+            axis_x = y1 - y2  # normal of this edge
+            axis_y = x2 - x1
+            if axis_x == 0 and axis_y == 0:
+                continue
+            a_dots = [x * axis_x + y * axis_y for x, y in poly_a]
+            b_dots = [x * axis_x + y * axis_y for x, y in poly_b]
+            if max(a_dots) <= min(b_dots) or max(b_dots) <= min(a_dots):
+                return False
+    return True
+
+
+def boxes_overlapping(corners, boxes) -> np.ndarray:
+    # polygons_overlap() of one convex polygon against many boxes at once, boxes being an (n, 4, 2) array of
+    # box_corners(). returns a bool per box
+    poly = np.asarray(corners, dtype=float)
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4, 2)
+    overlapping = np.ones(len(boxes), dtype=bool)
+    for axes in (edge_normals(poly)[np.newaxis], edge_normals(boxes)):  # the polygon's axes, then each box's own
+        poly_dots = np.einsum('pc,nac->nap', poly, np.broadcast_to(axes, (len(boxes),) + axes.shape[1:]))
+        box_dots = np.einsum('npc,nac->nap', boxes, np.broadcast_to(axes, (len(boxes),) + axes.shape[1:]))
+        separated = ((poly_dots.max(axis=2) <= box_dots.min(axis=2)) | (box_dots.max(axis=2) <= poly_dots.min(axis=2)))
+        overlapping &= ~separated.any(axis=1)
+    return overlapping
+
+
+def edge_normals(polys) -> np.ndarray:  # (..., points, 2) corners -> the normal of each edge, same shape
+    edges = polys - np.roll(polys, 1, axis=-2)
+    return np.stack((-edges[..., 1], edges[..., 0]), axis=-1)
+
+
+def check_piece(floor, furn_object) -> Collisions:
+    # everything on the floor that the piece (anything with furn_type, rect and footprint()) runs into
+    found = Collisions()
+    corners = furn_object.footprint()
+    found.pieces = pieces_hitting(floor, corners, furn_object.rect, furn_object)
+    if furn_object.furn_type not in WALL_MOUNTED:
+        found.walls = walls_hitting(floor, corners, furn_object.rect)
+    if furn_object.furn_type in CLEARANCES:
+        front = math.dist(corners[0], corners[1])
+        found.zone = front_zone(corners, front * CLEARANCES[furn_object.furn_type])
+        zone_rect = bounding_rect(found.zone)
+        found.zone_pieces = pieces_hitting(floor, found.zone, zone_rect, furn_object)
+        found.zone_walls = walls_hitting(floor, found.zone, zone_rect)
+    return found
+
+
+def pieces_hitting(floor, corners, area, furn_object) -> list:
+    # broad phase: every room's grid narrows the floor down to the pieces whose rects overlap area.
+    # narrow phase: their oriented boxes against corners, all in one go
+    if furn_object.furn_type in FLOOR_COVERINGS:
+        return []
+    # when both boxes are square to the axes, the grid's rect overlap test already was the exact one
+    exact_rects = area is furn_object.rect and is_upright(furn_object)
+    hits = []
+    candidates = []
+    for room in floor.rooms_in(area):
+        for _, other in room.furniture_index.query(area):
+            if other is furn_object or other.furn_type in FLOOR_COVERINGS:
+                continue
+            if exact_rects and is_upright(other):
+                hits.append(other)
+            else:
+                candidates.append(other)
+    if candidates:
+        overlapping = boxes_overlapping(corners, [other.footprint() for other in candidates])
+        hits.extend(other for other, hit in zip(candidates, overlapping.tolist()) if hit)
+    return hits
+
+
+def is_upright(furn_object) -> bool:  # turned by a multiple of 90 degrees, so its rect is its outline
+    return furn_object.angle % 90 == 0
+
+
+def walls_hitting(floor, corners, area) -> list:  # (room, wall index) for each wall crossing the polygon
+    hits = []
+    for room in floor.rooms_in(area):
+        points = room.geometry.points
+        for ind in range(len(points)):
+            start = points[ind]
+            end = points[(ind + 1) % len(points)]
+            if area.clipline(start, end) and polygons_overlap(corners, (start, end)):
+                hits.append((room, ind))
+    return hits
@@ -0,0 +1,112 @@
+# Room Planner batch image export
+# Desc: Renders saved plans to PNG without opening a window, using the same Room/Furniture/UserInterface drawing
+#       code as the app. Plans are spread over a pool of worker processes, each worker writes its images straight
+#       to disk, and progress and throughput are printed as the results come back.
+#
+# Usage:
+#   python export.py plans/*.rplan [--out renders] [--jobs 8] [--fit] [--no-interface] [--no-grid]
+#   (a plan with several floors gives one image per floor: name.png, name_floor2.png, ...)
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+import pygame
+
+import main as planner
+
+
+def init_worker() -> None:  # each process gets its own headless pygame
+    planner.init_display(headless=True)
+
+
+def output_paths(plan_path, out_dir, floor_count) -> list:
+    name = os.path.splitext(os.path.basename(plan_path))[0]
+    return [os.path.join(out_dir, name + ('.png' if num == 0 else '_floor{}.png'.format(num + 1)))
+            for num in range(floor_count)]
+
+
+def render_plan(job) -> tuple:
+    # runs in a worker: opens one plan, draws each floor onto an offscreen surface and saves it.
+    # returns (plan path, image paths, seconds, error message or None)
+    plan_path, out_dir, options = job
+    start = time.perf_counter()
+    try:
+        app = planner.RoomPlanner()
+        app.open_plan(plan_path)
+        app.show_grid_bool = options['grid']
+        app.show_interface = options['interface']
+        view = pygame.Rect(0, 0, planner.SCREEN_WIDTH, planner.SCREEN_HEIGHT)
+        if options['interface']:  # leave the furniture panel and the buttons along the bottom alone
+            view = pygame.Rect(app.ui.FURNITURE_PANEL_WIDTH, 0, planner.SCREEN_WIDTH - app.ui.FURNITURE_PANEL_WIDTH,
+                               planner.SCREEN_HEIGHT - 90)
+        planner.screen = pygame.Surface((planner.SCREEN_WIDTH, planner.SCREEN_HEIGHT)).convert()
+
+        image_paths = output_paths(plan_path, out_dir, len(app.building.floors))
+        for floor, image_path in zip(app.building.floors, image_paths):
+            app.floor = floor
+            app.room = floor.rooms[0] if floor.rooms else planner.Room()
+            planner.camera.reset()
+            if options['fit'] and floor.rooms:
+                bounds = floor.rooms[0].bounds().unionall([room.bounds() for room in floor.rooms[1:]])
+                planner.camera.fit(bounds.inflate(planner.DIRTY_MARGIN * 2, planner.DIRTY_MARGIN * 2), view)
+            app.draw_scene()
+            pygame.image.save(planner.screen, image_path)
+    except (OSError, ValueError, pygame.error) as error:
+        return plan_path, [], time.perf_counter() - start, str(error)
+    except Exception as error:  # a bad plan must never take the rest of the batch down with it
+        return plan_path, [], time.perf_counter() - start, '{}: {}'.format(type(error).__name__, error)
+    return plan_path, image_paths, time.perf_counter() - start, None
+
+
+def export_plans(plan_paths, out_dir, jobs, options) -> int:  # returns how many plans failed
+    os.makedirs(out_dir, exist_ok=True)
+    work = [(plan_path, out_dir, options) for plan_path in plan_paths]
+    start = time.perf_counter()
+    failures = 0
+    images = 0
+    if jobs == 1:  # no pool, handy for debugging
+        init_worker()
+        results = map(render_plan, work)
+    else:
+        pool = multiprocessing.Pool(jobs, initializer=init_worker)
+        results = pool.imap_unordered(render_plan, work, chunksize=max(1, min(16, len(work) // (jobs * 8))))
+    try:
+        for done, (plan_path, image_paths, seconds, error) in enumerate(results, 1):
+            if error is None:
+                images += len(image_paths)
+                print('[{}/{}] {} -> {} ({:.0f} ms)'.format(done, len(work), plan_path, ', '.join(image_paths),
+                                                          seconds * 1000))
+            else:
+                failures += 1
+                print('[{}/{}] {} failed: {}'.format(done, len(work), plan_path, error), file=sys.stderr)
+    finally:
+        if jobs != 1:
+            pool.close()
+            pool.join()
+
+    total = time.perf_counter() - start
+    print('{} plans ({} images, {} failed) in {:.1f} s, {:.1f} plans/s with {} job{}'.format(
+        len(work), images, failures, total, len(work) / total if total else 0.0, jobs, '' if jobs == 1 else 's'))
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Render saved Room Planner plans to PNG')
+    parser.add_argument('plans', nargs='+', help='plan files (.rplan or .json)')
+    parser.add_argument('--out', default='renders', help='folder for the images (default: renders)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='worker processes (default: all cores)')
+    parser.add_argument('--fit', action='store_true', help='zoom to fit each floor instead of the default view')
+    parser.add_argument('--no-interface', action='store_true', help='leave out the furniture panel and buttons')
+    parser.add_argument('--no-grid', action='store_true', help='leave out the background grid')
+    args = parser.parse_args()
+
+    options = {'fit': args.fit, 'interface': not args.no_interface, 'grid': not args.no_grid}
+    failures = export_plans(args.plans, args.out, max(1, args.jobs), options)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# Room Planner bulk furnishing
+# Desc: Fills every room of saved plans with the same list of furniture, placed by the layout solver (layout.py)
+#       around whatever is already in each room, and saves the furnished plans to another folder. Every room of every
+#       plan goes into one solve, so the worker pool stays busy across the whole batch.
+#
+# Usage:
+#   python furnish.py plans/*.rplan --furniture Bed,Nightstand,Desk,Chair,Door,Window [--out furnished]
+#                     [--budget 2] [--restarts 8] [--jobs 8]
+
+import argparse
+import os
+import sys
+import time
+
+import main as planner
+from layout import RESTARTS, solve_layouts
+
+
+def furnish_plans(plan_paths, out_dir, furn_types, budget, restarts, jobs) -> int:  # returns rooms left with problems
+    os.makedirs(out_dir, exist_ok=True)
+    sizes = planner.furniture_sizes()
+    buildings = [planner.load_building(plan_path) for plan_path in plan_paths]
+    rooms = [room for building in buildings for floor in building.floors for room in floor.rooms]
+    problems = [(room.wall_polygon(), furn_types, sizes,
+                 [(furn_object.furn_type, furn_object.footprint()) for furn_object in room.furniture_pieces])
+                for room in rooms]
+
+    start = time.perf_counter()
+    results = solve_layouts(problems, budget=budget, restarts=restarts, jobs=jobs)
+    seconds = time.perf_counter() - start
+
+    unsolved = 0
+    results = iter(results)
+    for plan_path, building in zip(plan_paths, buildings):
+        plan_unsolved = 0
+        for floor in building.floors:
+            for room in floor.rooms:
+                placements, violations = next(results)
+                room.add_furniture_many([planner.furniture_from_placement(placement) for placement in placements])
+                floor.room_changed(room)
+                plan_unsolved += violations > 0
+        out_path = os.path.join(out_dir, os.path.basename(plan_path))
+        planner.save_building(building, out_path)
+        unsolved += plan_unsolved
+        print('{} -> {} ({} rooms{})'.format(plan_path, out_path, sum(len(floor) for floor in building.floors),
+                                             ', {} with overlaps or blocked doors'.format(plan_unsolved)
+                                             if plan_unsolved else ''))
+    print('{} rooms in {:.1f} s, {:.1f} rooms/s with {} job{}'.format(
+        len(problems), seconds, len(problems) / seconds if seconds else 0.0, jobs, '' if jobs == 1 else 's'))
+    return unsolved
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Lay out furniture in every room of saved Room Planner plans')
+    parser.add_argument('plans', nargs='+', help='plan files (.rplan or .json)')
+    parser.add_argument('--furniture', required=True,
+                        help='comma separated types to add to each room, from: ' + ', '.join(planner.FURNITURE_TYPES))
+    parser.add_argument('--out', default='furnished', help='folder for the furnished plans (default: furnished)')
+    parser.add_argument('--budget', type=float, default=2.0, help='seconds of searching per room (default: 2)')
+    parser.add_argument('--restarts', type=int, default=RESTARTS, help='annealing runs per room, the best is kept')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='worker processes (default: all cores)')
+    args = parser.parse_args()
+
+    furn_types = [name.strip() for name in args.furniture.split(',') if name.strip()]
+    unknown = [name for name in furn_types if name not in planner.FURNITURE_TYPES]
+    if unknown:
+        parser.error('unknown furniture type: ' + ', '.join(unknown))
+    planner.init_display(headless=True)
+    unsolved = furnish_plans(args.plans, args.out, furn_types, args.budget, args.restarts, max(1, args.jobs))
+    sys.exit(1 if unsolved else 0)
+
+
+if __name__ == '__main__':
+    main()
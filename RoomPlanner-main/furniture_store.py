@@ -0,0 +1,196 @@
+# Array-backed furniture geometry used by the Room Planner.
+# Desc: Keeps the center, size, angle and type of every furniture piece in NumPy arrays (one array per field), so
+#       layout checks over a whole floor (overlapping pieces, pieces cut by a wall, pieces outside the room) run as
+#       a few vectorized passes instead of Python loops over Furniture objects.
+
+import numpy as np
+
+PAIR_CHUNK_SIZE = 1 << 20  # max box/box or box/wall candidates checked in one go, keeps memory bounded
+
+
+class FurnitureStore:
+    def __init__(self, capacity: int = 64):
+        self.count = 0
+        self.items = []  # row -> the object stored in that row (the Furniture piece)
+        self.rows = {}  # object -> row
+        self.center_x = np.zeros(capacity)
+        self.center_y = np.zeros(capacity)
+        self.width = np.zeros(capacity)
+        self.height = np.zeros(capacity)
+        self.angle = np.zeros(capacity)
+        self.type_id = np.zeros(capacity, dtype=np.int16)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, item) -> bool:
+        return item in self.rows
+
+    def add(self, item, rect, angle, type_id) -> int:
+        if self.count == len(self.center_x):
+            self.grow(len(self.center_x) * 2)
+        row = self.count
+        self.count += 1
+        self.items.append(item)
+        self.rows[item] = row
+        self.type_id[row] = type_id
+        self.update(item, rect, angle)
+        return row
+
+    def add_many(self, items, rects, angles, type_ids) -> None:  # add() for a batch of pieces, filled in per column
+        first = self.count
+        count = len(items)
+        if first + count > len(self.center_x):
+            self.grow(max(len(self.center_x) * 2, first + count))
+        for row, item in enumerate(items, first):
+            self.rows[item] = row
+        self.items.extend(items)
+        self.count += count
+        rows = slice(first, first + count)
+        x, y, width, height = np.array([(rect.x, rect.y, rect.width, rect.height) for rect in rects],
+                                       dtype=float).reshape(-1, 4).T
+        self.center_x[rows] = x + width / 2
+        self.center_y[rows] = y + height / 2
+        self.width[rows] = width
+        self.height[rows] = height
+        self.angle[rows] = angles
+        self.type_id[rows] = type_ids
+
+    def update(self, item, rect, angle) -> None:  # rect can be a pygame.Rect or anything with x/y/width/height
+        row = self.rows[item]
+        self.center_x[row] = rect.x + rect.width / 2  # not rect.center, which rounds odd sizes down
+        self.center_y[row] = rect.y + rect.height / 2
+        self.width[row] = rect.width
+        self.height[row] = rect.height
+        self.angle[row] = angle
+
+    def remove(self, item) -> None:  # swaps the last row into the hole, so removal is O(1) and rows stay packed
+        row = self.rows.pop(item)
+        last = self.count - 1
+        if row != last:
+            for column in (self.center_x, self.center_y, self.width, self.height, self.angle, self.type_id):
+                column[row] = column[last]
+            self.items[row] = self.items[last]
+            self.rows[self.items[row]] = row
+        self.items.pop()
+        self.count -= 1
+
+    def grow(self, capacity) -> None:
+        for name in ('center_x', 'center_y', 'width', 'height', 'angle', 'type_id'):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.count] = column[:self.count]
+            setattr(self, name, grown)
+
+    def bounds(self) -> tuple:  # left, top, right, bottom arrays for the rows in use
+        half_width = self.width[:self.count] / 2
+        half_height = self.height[:self.count] / 2
+        center_x = self.center_x[:self.count]
+        center_y = self.center_y[:self.count]
+        return center_x - half_width, center_y - half_height, center_x + half_width, center_y + half_height
+
+    def overlapping_pairs(self) -> tuple:
+        # sweep and prune inside horizontal bands: every box is listed once per band it touches, the entries are
+        # sorted by (band, left edge), and each entry only gets checked against the later entries in its band whose
+        # left edge falls before its right edge. returns two arrays of rows, (a[k], b[k]) being the k-th
+        # overlapping pair. touching edges don't count, same as pygame.Rect.colliderect
+        if self.count < 2:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        left, top, right, bottom = self.bounds()
+        band_height = max(1.0, 2 * float(np.median(bottom - top)))
+        first_band = np.floor((top - top.min()) / band_height).astype(np.intp)
+        last_band = np.floor((bottom - top.min()) / band_height).astype(np.intp)
+        band_counts = last_band - first_band + 1
+        rows = np.repeat(np.arange(self.count), band_counts)
+        band = np.repeat(first_band, band_counts) + (np.arange(len(rows)) -
+                                                     np.repeat(np.cumsum(band_counts) - band_counts, band_counts))
+        span = float(right.max() - left.min()) + 1  # one band's worth of sort key, so bands never interleave
+        keys = band * span + (left[rows] - left.min())
+        order = np.argsort(keys, kind='stable')
+        rows, band, keys = rows[order], band[order], keys[order]
+        ends = np.searchsorted(keys, band * span + (right[rows] - left.min()), side='left')
+        counts = np.maximum(ends - np.arange(len(rows)) - 1, 0)
+
+        firsts = []
+        seconds = []
+        start = 0
+        while start < len(rows):  # chunk so the expanded candidate list never gets too big
+            cumulative = np.cumsum(counts[start:])
+            stop = start + max(1, int(np.searchsorted(cumulative, PAIR_CHUNK_SIZE, side='right')))
+            chunk_counts = counts[start:stop]
+            first = np.repeat(np.arange(start, stop), chunk_counts)
+            offsets = np.arange(len(first)) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+            a = rows[first]
+            b = rows[first + 1 + offsets]
+            overlap = (top[a] < bottom[b]) & (top[b] < bottom[a]) & (left[b] < right[a]) & (left[a] < right[b])
+            # a pair can share several bands, only keep it in the band where their overlap starts
+            overlap_top = np.maximum(top[a], top[b])
+            overlap &= np.floor((overlap_top - top.min()) / band_height).astype(np.intp) == band[first]
+            firsts.append(a[overlap])
+            seconds.append(b[overlap])
+            start = stop
+        return np.concatenate(firsts), np.concatenate(seconds)
+
+    def wall_crossings(self, polygon) -> tuple:
+        # which boxes does each wall of the closed polygon (an (n, 2) array of corners) pass through?
+        # Liang-Barsky clipping of every wall against every box at once. returns (rows, wall indexes)
+        start = np.asarray(polygon, dtype=float).reshape(-1, 2)
+        end = np.roll(start, -1, axis=0)
+        rows = []
+        walls = []
+        walls_per_chunk = max(1, PAIR_CHUNK_SIZE // max(1, self.count))
+        for first_wall in range(0, len(start), walls_per_chunk):
+            chunk = slice(first_wall, first_wall + walls_per_chunk)
+            chunk_rows, chunk_walls = self.segments_crossing(start[chunk], end[chunk])
+            rows.append(chunk_rows)
+            walls.append(chunk_walls + first_wall)
+        if not rows:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        return np.concatenate(rows), np.concatenate(walls)
+
+    def segments_crossing(self, start, end) -> tuple:
+        left, top, right, bottom = (side[np.newaxis, :] for side in self.bounds())
+        x0, y0 = start[:, 0:1], start[:, 1:2]
+        dx, dy = end[:, 0:1] - x0, end[:, 1:2] - y0
+
+        t_enter = np.zeros((len(start), self.count))
+        t_exit = np.ones((len(start), self.count))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for delta, origin, low, high in ((dx, x0, left, right), (dy, y0, top, bottom)):
+                t_low = (low - origin) / delta
+                t_high = (high - origin) / delta
+                moving = delta != 0
+                t_enter = np.where(moving, np.maximum(t_enter, np.minimum(t_low, t_high)), t_enter)
+                t_exit = np.where(moving, np.minimum(t_exit, np.maximum(t_low, t_high)), t_exit)
+                # a wall parallel to this axis only hits boxes it runs strictly inside of
+                inside = (low < origin) & (origin < high)
+                t_exit = np.where(moving | inside, t_exit, -1.0)
+        segments, rows = np.nonzero(t_enter < t_exit)
+        return rows, segments
+
+    def outside_polygon(self, polygon) -> np.ndarray:
+        # rows of boxes that aren't completely inside the closed polygon: a corner is outside it, or a wall cuts
+        # through the box (which catches boxes straddling the notch of an L-shaped room)
+        left, top, right, bottom = self.bounds()
+        # corners nudged half a pixel inwards, so a box flush against any wall counts as inside (the even-odd test
+        # is half-open, and would put a corner on a right or bottom wall outside)
+        nudge_x = np.minimum(0.5, (right - left) / 2)
+        nudge_y = np.minimum(0.5, (bottom - top) / 2)
+        corners_x = np.concatenate((left + nudge_x, right - nudge_x, right - nudge_x, left + nudge_x))
+        corners_y = np.concatenate((top + nudge_y, top + nudge_y, bottom - nudge_y, bottom - nudge_y))
+        inside = points_in_polygon(corners_x, corners_y, polygon).reshape(4, self.count).all(axis=0)
+        crossing_rows, _ = self.wall_crossings(polygon)
+        inside[crossing_rows] = False
+        return np.nonzero(~inside)[0]
+
+
+def points_in_polygon(x, y, polygon) -> np.ndarray:  # even-odd rule, looping over walls and vectorized over points
+    polygon = np.asarray(polygon, dtype=float)
+    inside = np.zeros(len(x), dtype=bool)
+    for (x1, y1), (x2, y2) in zip(polygon, np.roll(polygon, -1, axis=0)):
+        if y1 == y2:
+            continue
+        straddles = (y1 > y) != (y2 > y)
+        crossing_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= straddles & (x < crossing_x)
+    return inside
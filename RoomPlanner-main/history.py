@@ -0,0 +1,70 @@
+# Undo/redo history used by the Room Planner.
+# Desc: Keeps edits as small command tuples (what kind of edit, which room and piece or corner, and the numbers
+#       needed to apply it either way) instead of copies of rooms or images, so a long session's history stays a few
+#       hundred bytes per step. A drag is recorded once, when it's let go, as a single entry. The undo stack is capped
+#       and drops its oldest entries first, and undo/redo only ever pop one entry off one stack and push it onto the
+#       other. main.py knows how to apply each kind of entry.
+#
+# Entries, first item is the kind:
+#   (MOVE_VERTEX, room, vertex index, dx, dy)
+#   (ADD_VERTEX, room, (x, y))                          a corner added at the end of the outline
+#   (REMOVE_VERTEX, room, (x, y))                       the last corner taken away, and where it was
+#   (MOVE_FURNITURE, piece, old room, new room, dx, dy) new room differs if the piece was dropped into another room
+#   (TRANSFORM_FURNITURE, room, piece, before, after)   resize/rotate, before and after are furniture_state()s
+#   (ADD_FURNITURE, room, piece)
+#   (DELETE_FURNITURE, room, piece, z)                  z is where it was in the room's stacking order
+#   (GROUP, list of entries)                            several edits made as one, e.g. an automatic layout
+
+from collections import deque
+
+HISTORY_LIMIT = 1000  # undo steps kept, the oldest are forgotten first
+
+MOVE_VERTEX = 1
+ADD_VERTEX = 2
+REMOVE_VERTEX = 3
+MOVE_FURNITURE = 4
+TRANSFORM_FURNITURE = 5
+ADD_FURNITURE = 6
+DELETE_FURNITURE = 7
+GROUP = 8
+
+
+class EditHistory:
+    def __init__(self, limit=HISTORY_LIMIT):
+        self.undo_stack = deque(maxlen=limit)  # a full deque drops from the other end, so recording stays O(1)
+        self.redo_stack = []
+
+    def __len__(self) -> int:
+        return len(self.undo_stack)
+
+    def record(self, entry) -> None:  # a new edit makes anything that was undone unreachable
+        self.undo_stack.append(entry)
+        self.redo_stack.clear()
+
+    def clear(self) -> None:
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+    def can_undo(self) -> bool:
+        return bool(self.undo_stack)
+
+    def can_redo(self) -> bool:
+        return bool(self.redo_stack)
+
+    def undo(self):  # the entry to reverse, or None if there's nothing to undo
+        if not self.undo_stack:
+            return None
+        entry = self.undo_stack.pop()
+        self.redo_stack.append(entry)
+        return entry
+
+    def redo(self):  # the entry to apply again, or None
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack.pop()
+        self.undo_stack.append(entry)
+        return entry
+
+
+def furniture_state(furn_object) -> tuple:  # everything a resize or rotate changes: (x, y, w, h), angle, rotozoom scale
+    return tuple(furn_object.rect), furn_object.angle, furn_object.rotation_scale
@@ -0,0 +1,349 @@
+# Automatic furniture layout used by the Room Planner.
+# Desc: Given a room outline and a list of furniture types, searches for placements where nothing overlaps, every
+#       piece stays inside the walls, doors and windows sit in a wall facing into the room, and nothing stands where
+#       a door swings. Each search is a simulated annealing run from a random start. Many independent runs (restarts)
+#       are spread over a process pool, all of them stop at a shared time budget, and the best layout per room wins.
+#       Moving one piece only re-scores that piece against the others, so a move costs O(pieces + walls).
+#       It only deals in numbers and type names (plus the rules in collision.py). main.py turns the placements into
+#       Furniture, and furnish.py lays out whole plans in bulk.
+#
+# A placement is (type, center x, center y, width, height, angle), width and height being the piece's size before
+# it's turned. Free-standing pieces only ever turn by right angles and keep their rects on whole pixels.
+
+import math
+import multiprocessing
+import random
+import time
+
+from collision import CLEARANCES, FLOOR_COVERINGS, WALL_MOUNTED, box_corners, front_zone, polygons_overlap
+from room_geometry import RoomGeometry
+
+RESTARTS = 8  # independent annealing runs per room, the best one is kept
+ITERATIONS = 6000  # moves per run, unless the time budget runs out first
+START_TEMPERATURE = 1.0
+END_TEMPERATURE = 0.002
+RIGHT_ANGLES = (0, 90, 180, -90)
+WALL_PULL = 0.05  # weight of the soft "stand against a wall" score, small next to any real violation
+WALL_PULL_DISTANCE = 200  # world pixels from a wall past which standing further away costs nothing more
+DEADLINE_CHECK = 256  # moves between looks at the clock
+
+
+class Shape:  # a box (plus the door swing in front of it, if it has one) as the scoring needs it
+    __slots__ = ('corners', 'bounds', 'upright', 'area', 'zone', 'zone_bounds')
+
+    def __init__(self, corners, upright, zone=None):
+        self.corners = corners
+        self.bounds = corner_bounds(corners)
+        self.upright = upright  # square to the axes, so bounds is the box itself
+        self.area = max(1.0, (self.bounds[2] - self.bounds[0]) * (self.bounds[3] - self.bounds[1]))
+        self.zone = zone
+        self.zone_bounds = corner_bounds(zone) if zone is not None else None
+
+
+class Piece:  # one piece being placed, and where the current search has it
+    __slots__ = ('furn_type', 'size', 'on_wall', 'walls', 'x', 'y', 'angle', 'wall', 'along', 'shape')
+
+    def __init__(self, furn_type, size, walls):
+        self.furn_type = furn_type
+        self.size = size  # width, height before turning
+        self.on_wall = furn_type in WALL_MOUNTED
+        self.walls = [ind for ind, wall in enumerate(walls) if wall[2] > size[0]]  # walls it fits along
+        self.x = 0  # top left of the rect, for free-standing pieces
+        self.y = 0
+        self.angle = 0
+        self.wall = 0  # wall index and how far along it (0 to 1) the center is, for doors and windows
+        self.along = 0.5
+        self.shape = None
+
+    def state(self) -> tuple:
+        return self.x, self.y, self.angle, self.wall, self.along, self.shape
+
+    def set_state(self, state) -> None:
+        self.x, self.y, self.angle, self.wall, self.along, self.shape = state
+
+
+class LayoutProblem:  # one room: its walls, the pieces to place and whatever is already there
+    def __init__(self, polygon, furn_types, sizes, fixed=()):
+        # sizes maps each type to its default (width, height), or is a list with each piece's own (width, height).
+        # fixed is a list of (type, corners) for pieces that stay where they are, so the new ones have to work
+        # around them
+        self.geometry = RoomGeometry(polygon)
+        self.walls = [wall_info(self.geometry, ind) for ind in range(len(self.geometry))]
+        self.bounds = self.geometry.bounds()
+        if isinstance(sizes, dict):
+            sizes = [sizes[furn_type] for furn_type in furn_types]
+        self.pieces = [Piece(furn_type, tuple(size), self.walls) for furn_type, size in zip(furn_types, sizes)]
+        self.fixed = [(furn_type, fixed_shape(furn_type, corners)) for furn_type, corners in fixed]
+
+    def place(self, piece, rng, step=None) -> None:  # a random spot for the piece, or a nudge of step pixels
+        if piece.on_wall:
+            if not piece.walls:  # fits along no wall at all, leave it in the middle of the longest one
+                piece.wall = max(range(len(self.walls)), key=lambda ind: self.walls[ind][2])
+                piece.along = 0.5
+            elif step is None or rng.random() < 0.2:
+                piece.wall = rng.choice(piece.walls)
+                piece.along = rng.random()
+            else:
+                piece.along += rng.gauss(0, step / self.walls[piece.wall][2])
+            length = self.walls[piece.wall][2]
+            margin = min(0.5, piece.size[0] / 2 / length) if length else 0.5
+            piece.along = min(1 - margin, max(margin, piece.along))
+        else:
+            if step is None or rng.random() < 0.05:
+                piece.angle = rng.choice(RIGHT_ANGLES)
+                piece.x = rng.randint(int(self.bounds[0]), int(self.bounds[2]))
+                piece.y = rng.randint(int(self.bounds[1]), int(self.bounds[3]))
+            elif rng.random() < 0.1:
+                piece.angle = rng.choice(RIGHT_ANGLES)
+            else:
+                piece.x += round(rng.gauss(0, step))
+                piece.y += round(rng.gauss(0, step))
+            width, height = turned_size(piece.size, piece.angle)
+            piece.x = min(int(self.bounds[2]) - width, max(int(self.bounds[0]), piece.x))
+            piece.y = min(int(self.bounds[3]) - height, max(int(self.bounds[1]), piece.y))
+        piece.shape = self.shape_of(piece)
+
+    def shape_of(self, piece) -> Shape:
+        if piece.on_wall:
+            (x1, y1), (x2, y2), _, angle = self.walls[piece.wall]
+            center = (x1 + (x2 - x1) * piece.along, y1 + (y2 - y1) * piece.along)
+            corners = box_corners(center, piece.size, angle)
+            piece.angle = angle
+            upright = angle in RIGHT_ANGLES
+        else:
+            width, height = turned_size(piece.size, piece.angle)
+            corners = [(piece.x, piece.y), (piece.x + width, piece.y), (piece.x + width, piece.y + height),
+                       (piece.x, piece.y + height)]
+            upright = True
+        zone = None
+        if piece.furn_type in CLEARANCES:  # the zone goes in front of the box, whichever way it faces
+            front = corners if piece.on_wall else box_corners(((corners[0][0] + corners[2][0]) / 2,
+                                                               (corners[0][1] + corners[2][1]) / 2),
+                                                              piece.size, piece.angle)
+            zone = front_zone(front, piece.size[0] * CLEARANCES[piece.furn_type])
+        return Shape(corners, upright, zone)
+
+    def own_score(self, ind) -> tuple:  # (violations, soft score) of one piece against the room and fixed pieces
+        piece = self.pieces[ind]
+        shape = piece.shape
+        violations = 0.0
+        if not piece.on_wall:
+            violations += self.outside(shape.corners, shape.bounds)
+        elif not piece.walls:
+            violations += 1.0
+        if shape.zone is not None:
+            violations += self.outside(shape.zone, shape.zone_bounds)
+        for furn_type, other_shape in self.fixed:
+            violations += pair_violation(piece.furn_type, shape, furn_type, other_shape)
+        soft = 0.0
+        if not piece.on_wall and piece.furn_type not in FLOOR_COVERINGS:
+            soft = WALL_PULL * min(WALL_PULL_DISTANCE, self.wall_distance(shape.bounds)) / WALL_PULL_DISTANCE
+        return violations, soft
+
+    def pair_score(self, ind, others) -> float:  # violations between one piece and the pieces at the other indexes
+        piece = self.pieces[ind]
+        return sum(pair_violation(piece.furn_type, piece.shape, self.pieces[other].furn_type, self.pieces[other].shape)
+                   for other in others if other != ind)
+
+    def piece_score(self, ind) -> tuple:
+        # everything the piece's position affects. moving it changes the layout's total by exactly the change in this
+        violations, soft = self.own_score(ind)
+        return violations + self.pair_score(ind, range(len(self.pieces))), soft
+
+    def total_score(self) -> tuple:
+        violations = 0.0
+        soft = 0.0
+        for ind in range(len(self.pieces)):
+            own_violations, own_soft = self.own_score(ind)
+            violations += own_violations + self.pair_score(ind, range(ind + 1, len(self.pieces)))
+            soft += own_soft
+        return violations, soft
+
+    def outside(self, corners, bounds) -> float:  # corners outside the walls plus walls cutting through the box
+        count = 0.0
+        center_x = (bounds[0] + bounds[2]) / 2
+        center_y = (bounds[1] + bounds[3]) / 2
+        for x, y in corners:  # nudged half a pixel inwards, so a box flush against a wall counts as inside
+            if not self.geometry.contains((x + math.copysign(0.5, center_x - x), y + math.copysign(0.5, center_y - y))):
+                count += 1
+        for start, end, _, _ in self.walls:
+            if min(start[0], end[0]) < bounds[2] and bounds[0] < max(start[0], end[0]) and \
+                    min(start[1], end[1]) < bounds[3] and bounds[1] < max(start[1], end[1]) and \
+                    polygons_overlap(corners, (start, end)):
+                count += 1
+        return count
+
+    def wall_distance(self, bounds) -> float:  # from the box to the nearest wall
+        nearest = math.inf
+        for start, end, _, _ in self.walls:
+            nearest = min(nearest, rect_segment_distance(bounds, start, end))
+        return nearest
+
+    def placements(self) -> list:
+        placed = []
+        for piece in self.pieces:
+            corners = piece.shape.corners
+            center = (corners[0][0] + corners[2][0]) / 2, (corners[0][1] + corners[2][1]) / 2
+            placed.append((piece.furn_type, center[0], center[1], piece.size[0], piece.size[1], piece.angle))
+        return placed
+
+
+def anneal(problem, rng, iterations, deadline) -> tuple:  # one run from a random start: (violations, soft, placements)
+    for piece in problem.pieces:
+        problem.place(piece, rng)
+    violations, soft = problem.total_score()
+    best = (max(0.0, round(violations, 9)), soft, problem.placements())  # rounded, so float drift can't hide a 0
+    if not problem.pieces:
+        return best
+    span = max(problem.bounds[2] - problem.bounds[0], problem.bounds[3] - problem.bounds[1])
+    cooling = (END_TEMPERATURE / START_TEMPERATURE) ** (1 / max(1, iterations))
+    temperature = START_TEMPERATURE
+    for iteration in range(iterations):
+        if iteration % DEADLINE_CHECK == 0 and time.time() > deadline:
+            break
+        ind = rng.randrange(len(problem.pieces))
+        piece = problem.pieces[ind]
+        old_state = piece.state()
+        old_violations, old_soft = problem.piece_score(ind)
+        problem.place(piece, rng, max(2.0, span * 0.25 * temperature / START_TEMPERATURE))
+        new_violations, new_soft = problem.piece_score(ind)
+        delta = (new_violations - old_violations) + (new_soft - old_soft)
+        if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+            violations += new_violations - old_violations
+            soft += new_soft - old_soft
+            if (round(violations, 9), soft) < best[:2]:
+                best = (max(0.0, round(violations, 9)), soft, problem.placements())
+                if not best[0] and best[1] < 1e-9:  # every rule kept and every piece against a wall already
+                    break
+        else:
+            piece.set_state(old_state)
+        temperature *= cooling
+    return best
+
+
+def run_restart(task) -> tuple:  # worker: (problem number, (violations, soft, placements))
+    num, problem_args, seed, iterations, seconds = task
+    return num, anneal(LayoutProblem(*problem_args), random.Random(seed), iterations, time.time() + seconds)
+
+
+def solve_layouts(problems, budget=1.0, restarts=RESTARTS, jobs=None, seed=None, iterations=ITERATIONS) -> list:
+    # problems is a list of (polygon, furniture types, sizes, fixed). every restart of every problem goes to one
+    # pool. each restart gets an equal slice of the time, so with the pool busy a problem takes about budget seconds
+    # and a batch about budget seconds per problem, and rooms late in a batch get as long as the first ones.
+    # returns a (placements, violations) pair per problem, violations being 0 for a layout that breaks no rules
+    restarts = max(1, restarts)
+    base_seed = random.randrange(1 << 30) if seed is None else seed
+    tasks = [(num, tuple(problem), base_seed + num * restarts + restart, iterations)
+             for num, problem in enumerate(problems) for restart in range(restarts)]
+    jobs = max(1, min(jobs or multiprocessing.cpu_count(), len(tasks)))  # idle workers don't shorten anything
+    seconds = budget * jobs / restarts
+    tasks = [task + (seconds,) for task in tasks]
+    best = [None] * len(problems)
+    if jobs == 1:
+        results = map(run_restart, tasks)
+    else:
+        pool = multiprocessing.Pool(jobs)
+        results = pool.imap_unordered(run_restart, tasks, chunksize=max(1, len(tasks) // (jobs * 16)))
+    try:
+        for num, result in results:
+            if best[num] is None or result[:2] < best[num][:2]:
+                best[num] = result
+    finally:
+        if jobs != 1:
+            pool.close()
+            pool.join()
+    return [(placements, violations) for violations, _, placements in best]
+
+
+def solve_layout(polygon, furn_types, sizes, fixed=(), **options) -> tuple:  # solve_layouts() for a single room
+    return solve_layouts([(polygon, furn_types, sizes, fixed)], **options)[0]
+
+
+def wall_info(geometry, ind) -> tuple:
+    # (start, end, length, angle) where angle turns a box so that its front (see collision.box_corners) faces
+    # into the room and its width runs along the wall
+    start = geometry.points[ind]
+    end = geometry.points[geometry.next_index(ind)]
+    length = geometry.lengths[ind]
+    if not length:
+        return start, end, 0.0, 0
+    normal = ((start[1] - end[1]) / length, (end[0] - start[0]) / length)
+    middle = ((start[0] + end[0]) / 2, (start[1] + end[1]) / 2)
+    if not geometry.contains((middle[0] + normal[0] * 2, middle[1] + normal[1] * 2)):
+        normal = (-normal[0], -normal[1])
+    angle = math.degrees(math.atan2(-normal[0], -normal[1]))  # box_corners' front normal is (-sin, -cos)
+    if abs(angle - round(angle / 90) * 90) < 1e-6:  # walls square to the axes get right angles exactly
+        angle = int(round(angle / 90) * 90)
+        angle = 180 if angle == -180 else angle
+    return start, end, length, angle
+
+
+def fixed_shape(furn_type, corners) -> Shape:
+    corners = [tuple(corner) for corner in corners]
+    upright = all(abs(corners[ind][0] - corners[ind - 1][0]) < 1e-6 or abs(corners[ind][1] - corners[ind - 1][1])
+                  < 1e-6 for ind in range(4))
+    zone = front_zone(corners, math.dist(corners[0], corners[1]) * CLEARANCES[furn_type]) \
+        if furn_type in CLEARANCES else None
+    return Shape(corners, upright, zone)
+
+
+def pair_violation(type_a, shape_a, type_b, shape_b) -> float:
+    # how badly two pieces get in each other's way: their boxes overlapping (rugs excepted) and either one standing
+    # in the other's door swing. overlaps of upright boxes count by how much of the smaller one is covered, so the
+    # search can tell a near miss from a pile-up
+    violation = 0.0
+    if type_a not in FLOOR_COVERINGS and type_b not in FLOOR_COVERINGS:
+        violation += box_overlap(shape_a.corners, shape_a.bounds, shape_a.upright, shape_a.area,
+                                 shape_b.corners, shape_b.bounds, shape_b.upright, shape_b.area)
+        if shape_a.zone is not None:
+            violation += box_overlap(shape_a.zone, shape_a.zone_bounds, False, 1.0,
+                                     shape_b.corners, shape_b.bounds, False, 1.0)
+        if shape_b.zone is not None:
+            violation += box_overlap(shape_b.zone, shape_b.zone_bounds, False, 1.0,
+                                     shape_a.corners, shape_a.bounds, False, 1.0)
+    return violation
+
+
+def box_overlap(corners_a, bounds_a, upright_a, area_a, corners_b, bounds_b, upright_b, area_b) -> float:
+    width = min(bounds_a[2], bounds_b[2]) - max(bounds_a[0], bounds_b[0])
+    height = min(bounds_a[3], bounds_b[3]) - max(bounds_a[1], bounds_b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    if upright_a and upright_b:
+        return 1.0 + width * height / min(area_a, area_b)
+    return 1.0 if polygons_overlap(corners_a, corners_b) else 0.0
+
+
+def corner_bounds(corners) -> tuple:  # left, top, right, bottom
+    xs = [corner[0] for corner in corners]
+    ys = [corner[1] for corner in corners]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def turned_size(size, angle) -> tuple:  # rect size of a box turned by a right angle
+    return (size[1], size[0]) if angle in (90, -90) else (size[0], size[1])
+
+
+def rect_segment_distance(bounds, start, end) -> float:  # 0 if the segment touches the rect
+    seg_left, seg_right = min(start[0], end[0]), max(start[0], end[0])
+    seg_top, seg_bottom = min(start[1], end[1]), max(start[1], end[1])
+    if start[0] == end[0] or start[1] == end[1]:  # a wall square to the axes is its own bounding box
+        return math.hypot(max(seg_left - bounds[2], 0, bounds[0] - seg_right),
+                          max(seg_top - bounds[3], 0, bounds[1] - seg_bottom))
+    corners = ((bounds[0], bounds[1]), (bounds[2], bounds[1]), (bounds[2], bounds[3]), (bounds[0], bounds[3]))
+    if seg_left < bounds[2] and bounds[0] < seg_right and seg_top < bounds[3] and bounds[1] < seg_bottom and \
+            polygons_overlap(corners, (start, end)):
+        return 0.0
+    nearest = min(point_segment_distance(point, start, end) for point in corners)
+    for x, y in (start, end):
+        nearest = min(nearest, math.hypot(max(bounds[0] - x, 0, x - bounds[2]), max(bounds[1] - y, 0, y - bounds[3])))
+    return nearest
+
+
+def point_segment_distance(point, start, end) -> float:
+    dx = end[0] - start[0]
+    dy = end[1] - start[1]
+    length_squared = dx * dx + dy * dy
+    t = 0.0 if not length_squared else max(0.0, min(1.0, ((point[0] - start[0]) * dx + (point[1] - start[1]) * dy)
+                                                      / length_squared))
+    return math.hypot(point[0] - start[0] - t * dx, point[1] - start[1] - t * dy)
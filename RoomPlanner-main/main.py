@@ -7,92 +7,400 @@
 # Desc: Completely independent project: Using Pygame, create a fully functioning room planner
 #       where you can drag and drop items, customize dimensions, etc.
 
-from sys import exit
+from sys import argv, exit
 
+import bisect
+import functools
 import math
+import os
 import pygame
 import random
 
+from assets import SpriteAtlas
+from building import Building, Floor
+from collision import WALL_MOUNTED, bounding_rect, box_corners, check_piece
+from furniture_store import FurnitureStore
+from history import (ADD_FURNITURE, ADD_VERTEX, DELETE_FURNITURE, GROUP, MOVE_FURNITURE, MOVE_VERTEX, REMOVE_VERTEX,
+                     TRANSFORM_FURNITURE, EditHistory, furniture_state)
+from layout import solve_layout
+from plan_file import read_plan, write_plan
+from profiler import FrameProfiler
+from room_geometry import RoomGeometry
+from snapping import SnapIndex, snap_offset
+from spatial_index import SpatialGrid
+from viewport import Camera, mipmap
+
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))  # so the planner doesn't have to be started from this folder
+FONT_PATH = os.path.join(ASSET_DIR, 'Fonts', 'MADEVoyager.otf')
+TEXT_CACHE_SIZE = 512  # max number of rendered text surfaces kept around (dimension labels change as things move)
+TRANSFORM_CACHE_SIZE = 256  # max number of rotated/resized furniture images kept around
+ROTATION_PREVIEW_STEP = 5  # degrees per cached preview angle while the rotate button is held
+ROTATION_PREVIEW_CACHE_SIZE = 128
+VERTEX_CELL_SIZE = 32  # spatial index cell sizes in pixels, roughly the size of the objects they hold
+FURNITURE_CELL_SIZE = 128
+SPAWN_TRIES = 100  # random points Room.spawn_point() tries in an area before giving up on it
+SNAP_DISTANCE = 10  # how close (in px) a dragged vertex or furniture edge has to get before it snaps into line
+
+FURNITURE_SCALES = {'Bed': .47, 'Desk': .25, 'Nightstand': .23, 'Rug': .24, 'Dresser': .33,
+                    'Chair': .32, 'TV': .32, 'Lamp': .32, 'Door': .32, 'Window': .32}  # default spawn sizes
+FURNITURE_TYPES = list(FURNITURE_SCALES)  # a type's position in this list is its type id in the FurnitureStore
+OVERLAY_ICONS = ['rotate_arrow', 'red_x_circle', 'width_arrow', 'height_arrow']
+PANEL_ICONS = {'Bed': (.3, (40, 72)), 'Desk': (.16, (222, 104)), 'Nightstand': (.18, (43, 286)),
+               'Rug': (.15, (228, 290)), 'Dresser': (.151, (27, 470)), 'Chair': (.18, (248, 470)),
+               'TV': (.16, (18, 652)), 'Lamp': (.212, (246, 634)), 'Door': (.172, (18, 854)),
+               'Window': (.175, (228, 864))}  # furniture panel thumbnails: scale of the full image, where it goes
+
 
 def draw_line(vertex1, vertex2) -> None:  # this static function allows for easy color changing and simpler lines
-    offset = pygame.math.Vector2(VERTEX_RADIUS, VERTEX_RADIUS)
-    vertex1_vector = pygame.math.Vector2(vertex1.rect.x, vertex1.rect.y) + offset
-    vertex2_vector = pygame.math.Vector2(vertex2.rect.x, vertex2.rect.y) + offset
-    pygame.draw.aaline(screen, (0, 0, 0), vertex1_vector, vertex2_vector)
-    # draw line starts the line from the top left corner of the rect, but we want to connect it
-    # to the center of our rectangle, so we need to offset the position vector by the radius
+    # walls connect the centers of the vertex rects, mapped from world to screen pixels by the camera
+    pygame.draw.aaline(screen, (0, 0, 0), camera.world_to_screen(vertex1.rect.center),
+                       camera.world_to_screen(vertex2.rect.center))
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(size: int) -> pygame.font.Font:  # one shared Font per size, so the .otf file is only parsed once
+    return pygame.font.Font(FONT_PATH, size)
+
+
+@functools.lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(text: str, size: int, color: tuple) -> pygame.Surface:
+    # the same labels ("Grid", wall lengths, etc.) get drawn every frame, so keep the rendered surfaces around.
+    # the returned surface is shared between callers, so it should only ever be blitted, never drawn on
+    return get_font(size).render(text, True, color)
+
 
+@functools.lru_cache(maxsize=None)
+def load_image(name: str) -> pygame.Surface:  # every sprite is only made once, on first use, from the atlas
+    return atlas.image(name)
 
-def calculate_distance(vertex1, vertex2) -> int:  # returns the distance between two vertices in "inches"
-    x_difference = vertex1.rect.x - vertex2.rect.x
-    y_difference = vertex1.rect.y - vertex2.rect.y
-    hypotenuse = math.sqrt(x_difference ** 2 + y_difference ** 2)
-    return int(hypotenuse // PIXELS_PER_INCH)
 
+@functools.lru_cache(maxsize=TRANSFORM_CACHE_SIZE)
+def transformed_image(furn_type: str, angle: int, size) -> pygame.Surface:
+    # angle is a right angle (0, 90, 180 or -90). size=None gives the default spawn size for that type.
+    # like render_text, the returned surface is shared, so it should only ever be blitted
+    image = load_image(furn_type)
+    if angle != 0:
+        image = pygame.transform.rotate(image, angle)
+    if size is None:
+        return pygame.transform.scale_by(image, FURNITURE_SCALES[furn_type])
+    return pygame.transform.smoothscale(image, size)
 
-def calculate_halfway_point(vertex1, vertex2) -> tuple:  # can only be used with vertices
-    x_pos = (vertex1.rect.centerx + vertex2.rect.centerx) // 2
-    y_pos = (vertex1.rect.centery + vertex2.rect.centery) // 2
-    return x_pos, y_pos
+
+@functools.lru_cache(maxsize=ROTATION_PREVIEW_CACHE_SIZE)
+def rotation_preview(furn_type: str, angle_bucket: int) -> pygame.Surface:
+    # the default-size image turned to a multiple of ROTATION_PREVIEW_STEP. it's small and gets reused for every
+    # mouse position in that bucket, so a rotate drag is mostly cache hits and cheap nearest-neighbour scaling
+    return pygame.transform.rotate(transformed_image(furn_type, 0, None), angle_bucket * ROTATION_PREVIEW_STEP)
+
+
+def asset_cache_stats() -> dict:  # hit/miss counters for the image registry and the transform/preview caches
+    image_info = load_image.cache_info()
+    transform_info = transformed_image.cache_info()
+    preview_info = rotation_preview.cache_info()
+    return {'image_hits': image_info.hits, 'image_misses': image_info.misses, 'images_loaded': image_info.currsize,
+            'transform_hits': transform_info.hits, 'transform_misses': transform_info.misses,
+            'transforms_cached': transform_info.currsize, 'preview_hits': preview_info.hits,
+            'preview_misses': preview_info.misses, 'previews_cached': preview_info.currsize}
+
+
+def text_cache_stats() -> dict:  # hit/miss counters for the font registry and the rendered text cache
+    font_info = get_font.cache_info()
+    text_info = render_text.cache_info()
+    return {'font_hits': font_info.hits, 'font_misses': font_info.misses, 'fonts_loaded': font_info.currsize,
+            'text_hits': text_info.hits, 'text_misses': text_info.misses, 'text_cached': text_info.currsize}
 
 
 class Room:
-    def __init__(self):
-        self.wall_vertices = [Vertex(650, 100), Vertex(1118, 100),
-                              Vertex(1118, 688), Vertex(866, 688),
-                              Vertex(866, 788), Vertex(650, 788)]
+    def __init__(self, corners=None):  # corners are the wall vertex centers in order, the default is the L shape
+        if corners is None:
+            corners = DEFAULT_ROOM_CORNERS
+        self.wall_vertices = [Vertex(x_pos, y_pos) for x_pos, y_pos in corners]
         self.furniture_pieces = []
 
+        # spatial indexes for click hit-testing. vertices are keyed by their list index (which doubles as their
+        # z-order, since later vertices are drawn on top), furniture by the object itself with a z-order stamp
+        self.vertex_index = SpatialGrid(VERTEX_CELL_SIZE)
+        self.furniture_grid = SpatialGrid(FURNITURE_CELL_SIZE)  # use furniture_index, which catches up first
+        self.next_z = 0
+        # sorted coordinate indexes for snapping: vertex centers, and the edges of every furniture piece
+        self.vertex_snaps = SnapIndex()
+        self.furniture_edges = SnapIndex()  # use furniture_snaps, which catches up first
+        # (pieces, first z) batches from add_furniture_many that the grid/snaps haven't taken in yet
+        self.ungridded_batches = []
+        self.unsnapped_batches = []
+        self.furniture_store = FurnitureStore()  # array copy of every piece's geometry for the layout checks
+        # the outline with cached wall lengths, midpoints, perimeter and area, kept in step by the vertex methods
+        self.geometry = RoomGeometry(vertex.rect.center for vertex in self.wall_vertices)
+        for num, vertex in enumerate(self.wall_vertices):
+            self.vertex_index.insert(num, vertex.rect, num)
+            self.vertex_snaps.set_point(num, vertex.rect.centerx, vertex.rect.centery)
+        # the scene.Scene this room is published to (see Floor.publish), its outline there and each piece's item
+        self.scene = None
+        self.scene_room = None
+        self.scene_pieces = {}
+
     def add_furniture(self, furn_object) -> None:
-        self.furniture_pieces.append(furn_object)
+        self.insert_furniture(furn_object, self.next_z)
+        self.next_z += 1
+
+    def insert_furniture(self, furn_object, z) -> None:  # undo uses it to put a deleted piece back at its old z
+        # furniture_pieces is always in z order, so the piece's place in the list can be found by bisecting
+        ind = bisect.bisect(self.furniture_pieces, z, key=self.furniture_z)
+        self.furniture_pieces.insert(ind, furn_object)
+        self.furniture_index.insert(furn_object, furn_object.rect, z)
+        self.furniture_snaps.set_rect(id(furn_object), furn_object.rect)
+        self.furniture_store.add(furn_object, furn_object.rect, furn_object.angle,
+                                 FURNITURE_TYPES.index(furn_object.furn_type))
+        if self.scene is not None:
+            self.publish_piece(furn_object)
+            if ind < len(self.furniture_pieces) - 1:
+                self.scene.restack(self.scene_pieces[furn_object], self.scene_pieces[self.furniture_pieces[ind + 1]])
+
+    def add_furniture_many(self, pieces) -> None:
+        # add_furniture for a whole batch, e.g. a loaded plan. the array store is filled right away (the room's
+        # bounds come from it), the click grid and snap index in bulk the first time they're needed, so rooms that
+        # are never drawn or edited never pay for them
+        self.furniture_pieces.extend(pieces)
+        self.furniture_store.add_many(pieces, [furn_object.rect for furn_object in pieces],
+                                      [furn_object.angle for furn_object in pieces],
+                                      [FURNITURE_TYPES.index(furn_object.furn_type) for furn_object in pieces])
+        self.ungridded_batches.append((pieces, self.next_z))
+        self.unsnapped_batches.append((pieces, self.next_z))
+        self.next_z += len(pieces)
+        if self.scene is not None:
+            for furn_object in pieces:
+                self.publish_piece(furn_object)
+
+    @property
+    def furniture_index(self) -> SpatialGrid:
+        while self.ungridded_batches:
+            pieces, first_z = self.ungridded_batches.pop(0)
+            self.furniture_grid.insert_many(pieces, [furn_object.rect for furn_object in pieces],
+                                            range(first_z, first_z + len(pieces)))
+        return self.furniture_grid
+
+    @property
+    def furniture_snaps(self) -> SnapIndex:
+        while self.unsnapped_batches:
+            pieces, _ = self.unsnapped_batches.pop(0)
+            self.furniture_edges.set_rects([id(furn_object) for furn_object in pieces],
+                                           [furn_object.rect for furn_object in pieces])
+        return self.furniture_edges
 
     def delete_furniture(self, ind) -> None:
-        self.furniture_pieces.pop(ind)
+        furn_object = self.furniture_pieces.pop(ind)
+        self.furniture_index.remove(furn_object)
+        self.furniture_snaps.remove_rect(id(furn_object))
+        self.furniture_store.remove(furn_object)
+        if self.scene is not None:
+            self.scene.remove(self.scene_pieces.pop(furn_object))
+
+    def furniture_z(self, furn_object) -> int:  # the piece's place in the stacking order, higher is drawn later
+        return self.furniture_index.z_of(furn_object)
+
+    def piece_index(self, furn_object) -> int:  # index of a piece in furniture_pieces, without scanning the list
+        return bisect.bisect_left(self.furniture_pieces, self.furniture_z(furn_object), key=self.furniture_z)
 
     def bring_furn_to_top(self, ind) -> int:  # moves the object at index to the end of the list
         self.furniture_pieces.append(self.furniture_pieces[ind])
         self.furniture_pieces.pop(ind)
+        self.furniture_index.set_z(self.furniture_pieces[-1], self.next_z)
+        self.next_z += 1
+        if self.scene is not None:
+            self.scene.restack(self.scene_pieces[self.furniture_pieces[-1]])
         return len(self.furniture_pieces) - 1
 
-    def add_vertex(self) -> None:
-        vert1 = self.wall_vertices[0]
-        vert2 = self.wall_vertices[len(self.wall_vertices) - 1]
-        halfway_pt = calculate_halfway_point(vert1, vert2)
+    def furniture_changed(self, furn_object) -> None:  # call after a piece is moved, resized or rotated
+        self.furniture_index.update(furn_object, furn_object.rect)
+        self.furniture_snaps.set_rect(id(furn_object), furn_object.rect)
+        self.furniture_store.update(furn_object, furn_object.rect, furn_object.angle)
+        if self.scene is not None:
+            width, height = furn_object.size()
+            self.scene.update(self.scene_pieces[furn_object], x=furn_object.rect.centerx,
+                              y=furn_object.rect.centery, width=width, height=height, angle=furn_object.angle,
+                              rotation_scale=furn_object.rotation_scale)
+
+    def publish(self, scene) -> None:  # mirrors the room into scene, and keeps it up to date with every edit
+        self.scene = scene
+        self.scene_room = scene.add_room(self.wall_polygon())
+        for furn_object in self.furniture_pieces:
+            self.publish_piece(furn_object)
+
+    def unpublish(self) -> None:  # takes the room back out of its scene
+        if self.scene is None:
+            return
+        for item in self.scene_pieces.values():
+            self.scene.remove(item)
+        self.scene.remove(self.scene_room)
+        self.scene = None
+        self.scene_room = None
+        self.scene_pieces = {}
+
+    def publish_piece(self, furn_object) -> None:
+        self.scene_pieces[furn_object] = self.scene.add_furniture(furn_object.furn_type, furn_object.rect.center,
+                                                                  furn_object.size(), furn_object.angle,
+                                                                  furn_object.rotation_scale)
+
+    def outline_changed(self) -> None:  # the scene's copy of the outline, after any vertex method
+        if self.scene is not None:
+            self.scene.update(self.scene_room, points=list(self.wall_polygon()))
+
+    def vertex_moved(self, ind) -> None:
+        self.vertex_index.update(ind, self.wall_vertices[ind].rect)
+        self.vertex_snaps.set_point(ind, self.wall_vertices[ind].rect.centerx, self.wall_vertices[ind].rect.centery)
+        self.geometry.move_point(ind, self.wall_vertices[ind].rect.center)
+        self.outline_changed()
+
+    @property
+    def perimeter(self) -> float:  # in inches
+        return self.geometry.perimeter / PIXELS_PER_INCH
+
+    @property
+    def area(self) -> float:  # in square inches
+        return self.geometry.area / PIXELS_PER_INCH ** 2
+
+    def wall_length(self, ind) -> int:  # whole inches, as shown on the wall's label
+        return int(self.geometry.lengths[ind] // PIXELS_PER_INCH)
+
+    def bounds(self) -> pygame.Rect:  # world area the room can draw into: its walls, vertex handles and furniture
+        left, top, right, bottom = self.geometry.bounds()
+        if len(self.furniture_store):
+            furniture_left, furniture_top, furniture_right, furniture_bottom = self.furniture_store.bounds()
+            left = min(left, math.floor(furniture_left.min()))
+            top = min(top, math.floor(furniture_top.min()))
+            right = max(right, math.ceil(furniture_right.max()))
+            bottom = max(bottom, math.ceil(furniture_bottom.max()))
+        return pygame.Rect(left, top, right - left, bottom - top).inflate(VERTEX_RADIUS * 2, VERTEX_RADIUS * 2)
+
+    def snap_vertex(self, ind, pos) -> tuple:  # lines pos up with the nearest other vertex on each axis
+        x_offset = snap_offset([self.vertex_snaps.x_axis], [pos[0]], SNAP_DISTANCE, exclude=ind)
+        y_offset = snap_offset([self.vertex_snaps.y_axis], [pos[1]], SNAP_DISTANCE, exclude=ind)
+        return pos[0] + x_offset, pos[1] + y_offset
+
+    def snap_furniture(self, furn_object, rect) -> tuple:  # topleft that lines the rect's edges up with walls/furniture
+        owner = id(furn_object)
+        x_offset = snap_offset([self.vertex_snaps.x_axis, self.furniture_snaps.x_axis], [rect.left, rect.right],
+                               SNAP_DISTANCE, exclude=owner)
+        y_offset = snap_offset([self.vertex_snaps.y_axis, self.furniture_snaps.y_axis], [rect.top, rect.bottom],
+                               SNAP_DISTANCE, exclude=owner)
+        return rect.left + x_offset, rect.top + y_offset
+
+    def spawn_point(self, area=None) -> tuple:
+        # a random world point inside the walls for a new piece to go, inside the world rect area too if the room
+        # reaches into it (e.g. the part of the room on screen). a thin or oddly shaped room may take a few tries
+        left, top, right, bottom = self.geometry.bounds()
+        room_rect = pygame.Rect(left, top, right - left + 1, bottom - top + 1)
+        shown = room_rect.clip(area) if area is not None else room_rect
+        for rect in (shown, room_rect) if shown.width and shown.height else (room_rect,):
+            for _ in range(SPAWN_TRIES):
+                point = (random.randint(rect.left, rect.right - 1), random.randint(rect.top, rect.bottom - 1))
+                if self.geometry.contains(point):
+                    return point
+        return room_rect.center
+
+    def furniture_at(self, pos) -> int:  # index of the topmost piece under the world position pos, or -1
+        furn_object = self.furniture_index.topmost_at((math.floor(pos[0]), math.floor(pos[1])))
+        if furn_object is None:
+            return -1
+        return self.piece_index(furn_object)
+
+    def vertex_at(self, pos, radius=None) -> int:
+        # index of the topmost vertex whose center is within radius (world pixels, so the camera can keep the
+        # handles clickable when zoomed out) of the world position pos, or -1
+        if radius is None:
+            radius = VERTEX_RADIUS
+        area = pygame.Rect(math.floor(pos[0] - radius), math.floor(pos[1] - radius),
+                           math.ceil(radius * 2) + 1, math.ceil(radius * 2) + 1)
+        for _, ind in reversed(self.vertex_index.query(area)):
+            center = self.wall_vertices[ind].rect.center
+            if center[0] - radius <= pos[0] < center[0] + radius and center[1] - radius <= pos[1] < center[1] + radius:
+                return ind
+        return -1
+
+    def add_vertex(self, pos=None) -> None:  # splits the closing wall (last vertex back to the first) in half
+        halfway_pt = self.geometry.midpoints[-1] if pos is None else pos  # redo puts the corner back at pos
         self.wall_vertices.append(Vertex(halfway_pt[0], halfway_pt[1]))
+        self.vertex_index.insert(len(self.wall_vertices) - 1, self.wall_vertices[-1].rect, len(self.wall_vertices) - 1)
+        self.vertex_snaps.set_point(len(self.wall_vertices) - 1, halfway_pt[0], halfway_pt[1])
+        self.geometry.append_point(halfway_pt)
+        self.outline_changed()
 
     def minus_vertex(self) -> None:
         if len(self.wall_vertices) > 2:
             self.wall_vertices.pop(len(self.wall_vertices) - 1)
-
-    def draw_walls(self) -> None:
+            self.vertex_index.remove(len(self.wall_vertices))
+            self.vertex_snaps.remove_point(len(self.wall_vertices))
+            self.geometry.pop_point()
+            self.outline_changed()
+
+    def plan_record(self) -> tuple:  # the room as plan_file saves it: corners, then pieces from bottom to top
+        furniture = [(furn_object.furn_type, furn_object.rect.centerx, furn_object.rect.centery,
+                      furn_object.rect.width, furn_object.rect.height, furn_object.angle, furn_object.rotation_scale)
+                     for furn_object in self.furniture_pieces]
+        return self.wall_polygon(), furniture
+
+    def wall_polygon(self) -> list:  # the room outline as a list of vertex centers, in order (don't modify it)
+        return self.geometry.points
+
+    def overlapping_furniture(self) -> list:  # every pair of pieces whose rects overlap
+        store = self.furniture_store
+        firsts, seconds = store.overlapping_pairs()
+        return [(store.items[a], store.items[b]) for a, b in zip(firsts.tolist(), seconds.tolist())]
+
+    def furniture_crossing_walls(self) -> list:  # (piece, wall index) for every wall running through a piece
+        # wall i goes from wall_vertices[i] to wall_vertices[i + 1] (wrapping around to the first vertex)
+        store = self.furniture_store
+        rows, walls = store.wall_crossings(self.wall_polygon())
+        return [(store.items[row], wall) for row, wall in zip(rows.tolist(), walls.tolist())]
+
+    def furniture_outside_room(self) -> list:  # pieces that are partly or completely outside the walls
+        store = self.furniture_store
+        return [store.items[row] for row in store.outside_polygon(self.wall_polygon()).tolist()]
+
+    # the draw methods take the world area being redrawn (see RoomPlanner.draw_scene) and skip anything outside it,
+    # so a dirty-rect frame only touches what's near the change
+
+    def draw_walls(self, area) -> None:
         for i in range(len(self.wall_vertices) - 1):
-            draw_line(self.wall_vertices[i], self.wall_vertices[i + 1])
-        draw_line(self.wall_vertices[len(self.wall_vertices) - 1], self.wall_vertices[0])  # draws the last line
-
-    def draw_vertices(self) -> None:
+            if area.clipline(self.wall_vertices[i].rect.center, self.wall_vertices[i + 1].rect.center):
+                draw_line(self.wall_vertices[i], self.wall_vertices[i + 1])
+        last_vertex = self.wall_vertices[len(self.wall_vertices) - 1]
+        if area.clipline(last_vertex.rect.center, self.wall_vertices[0].rect.center):
+            draw_line(self.wall_vertices[len(self.wall_vertices) - 1], self.wall_vertices[0])  # draws the last line
+
+    def vertex_dirty_rect(self, ind) -> pygame.Rect:  # screen area covering a vertex, both of its walls and labels
+        prev_vertex = self.wall_vertices[ind - 1]
+        next_vertex = self.wall_vertices[(ind + 1) % len(self.wall_vertices)]
+        area = self.wall_vertices[ind].screen_rect().unionall([prev_vertex.screen_rect(), next_vertex.screen_rect()])
+        return area.inflate(DIRTY_MARGIN * 2, DIRTY_MARGIN * 2)
+
+    def draw_vertices(self, area) -> None:
+        view = area.inflate(VERTEX_RADIUS * 2, VERTEX_RADIUS * 2)
         for i in range(0, len(self.wall_vertices)):
-            self.wall_vertices[i].draw_vertex()
-
-    def draw_wall_dimensions(self) -> None:
-        f = pygame.font.Font('Fonts/MADEVoyager.otf', 18)
-        for i in range(0, len(self.wall_vertices)):
-            if i == len(self.wall_vertices) - 1:
-                distance = calculate_distance(self.wall_vertices[0], self.wall_vertices[i])
-                halfway_pt = calculate_halfway_point(self.wall_vertices[0], self.wall_vertices[i])
-            else:
-                distance = calculate_distance(self.wall_vertices[i], self.wall_vertices[i + 1])
-                halfway_pt = calculate_halfway_point(self.wall_vertices[i], self.wall_vertices[i + 1])
-
-            dimension = str(distance) + '"'
-            text_surface = f.render(dimension, True, (100, 100, 100))
+            if view.collidepoint(self.wall_vertices[i].rect.center):
+                self.wall_vertices[i].draw_vertex()
+
+    def draw_wall_dimensions(self, area) -> None:  # lengths and midpoints come from the geometry cache, not re-measured
+        points = self.geometry.points
+        for i in range(0, len(points)):
+            if not area.clipline(points[i], points[i - len(points) + 1]):
+                continue  # label of a wall that's off screen
+            halfway_pt = self.geometry.midpoints[i]
+
+            dimension = str(self.wall_length(i)) + '"'
+            text_surface = render_text(dimension, 18, (100, 100, 100))
+            halfway_pt = camera.world_to_screen(halfway_pt)
             screen.blit(text_surface, (halfway_pt[0] + 4, halfway_pt[1] - 21))  # arbitrary styling numbers
 
-    def draw_all_furniture(self, draw_overlay, overlay_index) -> None:
-        for i in range(0, len(self.furniture_pieces)):
-            self.furniture_pieces[i].draw_furniture()
-        if draw_overlay:
-            self.furniture_pieces[overlay_index].draw_furn_overlay()
-            self.furniture_pieces[overlay_index].draw_furn_dimensions()
+    def draw_all_furniture(self, area) -> None:
+        # only the pieces in the area get drawn. the spatial index hands them back bottom to top, which is the same
+        # order as furniture_pieces
+        for _, furn_object in self.furniture_index.query(area):
+            furn_object.draw_furniture()
+
+    def draw_overlay(self, overlay_index) -> None:  # drawn after every room, so neighbouring rooms can't cover it
+        self.furniture_pieces[overlay_index].draw_furn_overlay()
+        self.furniture_pieces[overlay_index].draw_furn_dimensions()
 
 
 class Vertex:
@@ -100,92 +408,127 @@ class Vertex:
         self.rect = pygame.Rect(0, 0, VERTEX_RADIUS * 2, VERTEX_RADIUS * 2)
         self.rect.center = (x_pos, y_pos)
 
+    def screen_rect(self) -> pygame.Rect:  # vertex handles stay the same size on screen whatever the zoom
+        rect = pygame.Rect(0, 0, VERTEX_RADIUS * 2, VERTEX_RADIUS * 2)
+        rect.center = camera.world_to_screen(self.rect.center)
+        return rect
+
     def draw_vertex(self) -> None:
-        pygame.draw.rect(screen, (90, 90, 90), self.rect, 0, VERTEX_RADIUS)
+        pygame.draw.rect(screen, (90, 90, 90), self.screen_rect(), 0, VERTEX_RADIUS)
 
 
 class Furniture:
-    def __init__(self, f_type):
+    def __init__(self, f_type, rect=None, angle=0, rotation_scale=None, center=(0, 0)):
+        # rect/angle/rotation_scale are for restoring a saved piece, whose image isn't made until it's first drawn.
+        # a new piece is centered on center instead, see Room.spawn_point()
         self.furn_type = f_type
-        if self.furn_type == 'Bed':
-            self.img = pygame.transform.scale_by(BED_IMG, .47)
-        elif self.furn_type == 'Desk':
-            self.img = pygame.transform.scale_by(DESK_IMG, .25)
-        elif self.furn_type == 'Nightstand':
-            self.img = pygame.transform.scale_by(NIGHTSTAND_IMG, .23)
-        elif self.furn_type == 'Rug':
-            self.img = pygame.transform.scale_by(RUG_IMG, .24)
-        elif self.furn_type == 'Dresser':
-            self.img = pygame.transform.scale_by(DRESSER_IMG, .33)
-        elif self.furn_type == 'Chair':
-            self.img = pygame.transform.scale_by(CHAIR_IMG, .32)
-        elif self.furn_type == 'TV':
-            self.img = pygame.transform.scale_by(TV_IMG, .32)
-        elif self.furn_type == 'Lamp':
-            self.img = pygame.transform.scale_by(LAMP_IMG, .32)
-        elif self.furn_type == 'Door':
-            self.img = pygame.transform.scale_by(DOOR_IMG, .32)
-        elif self.furn_type == 'Window':
-            self.img = pygame.transform.scale_by(WINDOW_IMG, .32)
-        self.rect = self.img.get_rect()
-        x_pos = random.randint(730, 1070)  # initially spawn the furniture randomly in the middle
-        y_pos = random.randint(330, 570)
-        self.rect.center = (x_pos, y_pos)
-
-        self.angle = 0
-        self.img_face_up = pygame.transform.rotate(self.img, 180)
-        self.img_face_left = pygame.transform.rotate(self.img, 90)
-        self.img_face_right = pygame.transform.rotate(self.img, -90)
-
-        self.rotate_btn_img = pygame.image.load('Graphics/rotate_arrow.png').convert_alpha()
-        self.rotate_btn_rect = self.rotate_btn_img.get_rect()
-        self.delete_btn_img = pygame.image.load('Graphics/red_x_circle.png').convert_alpha()
-        self.delete_btn_rect = self.delete_btn_img.get_rect()
-
-        self.width_btn_img = pygame.image.load('Graphics/width_arrow.png').convert_alpha()
-        self.width_btn_rect = self.width_btn_img.get_rect()
-        self.height_btn_img = pygame.image.load('Graphics/height_arrow.png').convert_alpha()
-        self.height_btn_rect = self.height_btn_img.get_rect()
+        self.angle = angle
+        self.rotation_scale = rotation_scale  # rotozoom scale of a rotated piece's image, None if it's upright-scaled
+        self.pending_rotation_scale = None  # set while a rotate/resize preview is waiting for finish_transform()
+        self.pending_resize = False
+        self.sprite = None
+        self.footprint_key = None  # footprint() keeps its corners until the rect, angle or scale changes
+        self.footprint_corners = None
+        if rect is None:
+            self.img = transformed_image(self.furn_type, 0, None)
+            self.rect = self.img.get_rect(center=center)
+        else:
+            self.rect = pygame.Rect(rect)
+
+        # the overlay buttons get their real size and place when the overlay is drawn. until then they're empty,
+        # so they can't be clicked
+        self.rotate_btn_rect = pygame.Rect(0, 0, 0, 0)
+        self.delete_btn_rect = pygame.Rect(0, 0, 0, 0)
+        self.width_btn_rect = pygame.Rect(0, 0, 0, 0)
+        self.height_btn_rect = pygame.Rect(0, 0, 0, 0)
+
+    @property
+    def img(self) -> pygame.Surface:  # built on first use, so loading a big plan doesn't make any surfaces
+        if self.sprite is None:
+            self.sprite = self.build_img()
+        return self.sprite
+
+    @img.setter
+    def img(self, surface) -> None:
+        self.sprite = surface
+
+    def build_img(self) -> pygame.Surface:  # the image a restored piece would have had when it was saved
+        if self.rotation_scale is not None:
+            return pygame.transform.rotozoom(load_image(self.furn_type), self.angle, self.rotation_scale)
+        default_img = transformed_image(self.furn_type, int(self.angle), None)
+        if default_img.get_size() == self.rect.size:
+            return default_img
+        return transformed_image(self.furn_type, int(self.angle), self.rect.size)
 
     def draw_furniture(self) -> None:
-        screen.blit(self.img, self.rect.topleft)
-
-    def draw_furn_overlay(self) -> None:
-        self.rotate_btn_rect.topleft = self.rect.bottomright
-        screen.blit(self.rotate_btn_img, self.rotate_btn_rect.topleft)
-        self.delete_btn_rect.bottomleft = self.rect.topright
-        screen.blit(self.delete_btn_img, self.delete_btn_rect.topleft)
-        self.width_btn_rect.midleft = self.rect.midright
-        screen.blit(self.width_btn_img, self.width_btn_rect.topleft)
-        self.height_btn_rect.midbottom = self.rect.midtop
-        screen.blit(self.height_btn_img, self.height_btn_rect.topleft)
+        screen.blit(mipmap(self.img, camera.zoom_index), camera.world_to_screen(self.rect.topleft))
+
+    def footprint(self) -> list:  # corners of the piece's real (possibly turned) outline in world pixels
+        scale = self.pending_rotation_scale if self.pending_rotation_scale is not None else self.rotation_scale
+        if self.pending_resize:  # a right-angled piece being resized: its rect has the new size, the scale doesn't
+            scale = None
+        key = (self.rect.x, self.rect.y, self.rect.width, self.rect.height, self.angle, scale)
+        if self.footprint_key != key:  # collision checks ask for the same neighbours' outlines frame after frame
+            center = (self.rect.x + self.rect.width / 2, self.rect.y + self.rect.height / 2)
+            if scale is not None:  # freely rotated: the source image scaled and turned, inside a bigger bounding rect
+                width, height = load_image(self.furn_type).get_size()
+                self.footprint_corners = box_corners(center, (width * scale, height * scale), self.angle)
+            elif self.angle in (90, -90):  # a quarter-turned piece fills its rect with its sides swapped
+                self.footprint_corners = box_corners(center, (self.rect.height, self.rect.width), self.angle)
+            else:
+                self.footprint_corners = box_corners(center, self.rect.size, self.angle)
+            self.footprint_key = key
+        return self.footprint_corners
+
+    def size(self) -> tuple:  # (width, height) of the piece itself, before it was turned
+        corners = self.footprint()
+        return math.dist(corners[0], corners[1]), math.dist(corners[1], corners[2])
+
+    def dirty_rect(self) -> pygame.Rect:  # screen area covering the piece plus its overlay buttons and labels
+        return camera.world_rect_to_screen(self.rect).inflate(DIRTY_MARGIN * 2, DIRTY_MARGIN * 2)
+
+    def draw_furn_overlay(self) -> None:  # the buttons are placed in screen pixels, so clicks can test them directly
+        rect = camera.world_rect_to_screen(self.rect)
+        rotate_btn_img = load_image('rotate_arrow')  # the overlay icons are shared by every piece
+        self.rotate_btn_rect = rotate_btn_img.get_rect(topleft=rect.bottomright)
+        screen.blit(rotate_btn_img, self.rotate_btn_rect.topleft)
+        delete_btn_img = load_image('red_x_circle')
+        self.delete_btn_rect = delete_btn_img.get_rect(bottomleft=rect.topright)
+        screen.blit(delete_btn_img, self.delete_btn_rect.topleft)
+        width_btn_img = load_image('width_arrow')
+        self.width_btn_rect = width_btn_img.get_rect(midleft=rect.midright)
+        screen.blit(width_btn_img, self.width_btn_rect.topleft)
+        height_btn_img = load_image('height_arrow')
+        self.height_btn_rect = height_btn_img.get_rect(midbottom=rect.midtop)
+        screen.blit(height_btn_img, self.height_btn_rect.topleft)
 
     def draw_furn_dimensions(self) -> None:
-        f = pygame.font.Font('Fonts/MADEVoyager.otf', 18)
-
+        rect = camera.world_rect_to_screen(self.rect)  # where to draw; the numbers come from the world size
         horiz_distance = str(self.rect.width // PIXELS_PER_INCH) + '"'
-        text_surface = f.render(horiz_distance, True, (100, 100, 100))
-        horiz_halfway_pt = self.rect.width // 2 + self.rect.x, self.rect.height + self.rect.y
+        text_surface = render_text(horiz_distance, 18, (100, 100, 100))
+        horiz_halfway_pt = rect.width // 2 + rect.x, rect.height + rect.y
         screen.blit(text_surface, (horiz_halfway_pt[0] - 8, horiz_halfway_pt[1] + 14))  # arbitrary styling numbers
-        pygame.draw.line(screen, (50, 50, 50), (self.rect.x, self.rect.bottom + 14),
-                         (self.rect.right, self.rect.bottom + 14))
-        pygame.draw.line(screen, (50, 50, 50), (self.rect.x, self.rect.bottom + 14),
-                         (self.rect.x, self.rect.bottom + 8))
-        pygame.draw.line(screen, (50, 50, 50), (self.rect.right, self.rect.bottom + 14),
-                         (self.rect.right, self.rect.bottom + 8))
+        pygame.draw.line(screen, (50, 50, 50), (rect.x, rect.bottom + 14),
+                         (rect.right, rect.bottom + 14))
+        pygame.draw.line(screen, (50, 50, 50), (rect.x, rect.bottom + 14),
+                         (rect.x, rect.bottom + 8))
+        pygame.draw.line(screen, (50, 50, 50), (rect.right, rect.bottom + 14),
+                         (rect.right, rect.bottom + 8))
 
         verti_distance = str(self.rect.height // PIXELS_PER_INCH) + '"'
-        text_surface = f.render(verti_distance, True, (100, 100, 100))
-        verti_halfway_pt = self.rect.x, self.rect.height // 2 + self.rect.y
+        text_surface = render_text(verti_distance, 18, (100, 100, 100))
+        verti_halfway_pt = rect.x, rect.height // 2 + rect.y
         screen.blit(text_surface, (verti_halfway_pt[0] - 40, verti_halfway_pt[1] - 10))  # arbitrary styling numbers
-        pygame.draw.line(screen, (50, 50, 50), (self.rect.x - 14, self.rect.y),
-                         (self.rect.x - 14, self.rect.bottom))
-        pygame.draw.line(screen, (50, 50, 50), (self.rect.x - 14, self.rect.y),
-                         (self.rect.x - 8, self.rect.y))
-        pygame.draw.line(screen, (50, 50, 50), (self.rect.x - 14, self.rect.bottom),
-                         (self.rect.x - 8, self.rect.bottom))
-
-    def rotate_furniture(self, mouse) -> None:
+        pygame.draw.line(screen, (50, 50, 50), (rect.x - 14, rect.y),
+                         (rect.x - 14, rect.bottom))
+        pygame.draw.line(screen, (50, 50, 50), (rect.x - 14, rect.y),
+                         (rect.x - 8, rect.y))
+        pygame.draw.line(screen, (50, 50, 50), (rect.x - 14, rect.bottom),
+                         (rect.x - 8, rect.bottom))
+
+    def rotate_furniture(self, mouse, preview=False) -> None:
+        # preview=True is for while the rotate button is held: it shows a quick, angle-quantized image and leaves
+        # the proper rotozoom to finish_transform() when the button is let go
         old_center = self.rect.center
         x = mouse[0] - self.rect.centerx
         y = mouse[1] - self.rect.centery
@@ -200,36 +543,67 @@ class Furniture:
         elif -100 < self.angle < -80:
             self.angle = -90
         scale = abs(3.1 * d / SCREEN_WIDTH)
-        self.img = pygame.transform.rotozoom(globals()[self.furn_type.upper() + '_IMG'], self.angle, scale)
+        if preview:
+            preview_img = rotation_preview(self.furn_type, round(self.angle / ROTATION_PREVIEW_STEP))
+            # the preview was made from the default-size image, so rescale it relative to that size
+            self.img = pygame.transform.scale_by(preview_img, scale / FURNITURE_SCALES[self.furn_type])
+            self.pending_rotation_scale = scale
+        else:
+            self.img = pygame.transform.rotozoom(load_image(self.furn_type), self.angle, scale)
+            self.rotation_scale = scale
         self.rect = self.img.get_rect()
         self.rect.center = old_center
 
-    def scale_furn_width(self, mouse_relative) -> None:
+    def scale_furn_width(self, mouse_relative, preview=False) -> None:
         if self.rect.width + mouse_relative[0] > 15:
             self.rect.width += mouse_relative[0]
-        if self.angle == 0:
-            self.img = pygame.transform.scale(globals()[self.furn_type.upper() + '_IMG'],
-                                              (self.rect.width, self.rect.height))
-        elif self.angle == 180:
-            self.img = pygame.transform.scale(self.img_face_up, (self.rect.width, self.rect.height))
-        elif self.angle == 90:
-            self.img = pygame.transform.scale(self.img_face_left, (self.rect.width, self.rect.height))
-        elif self.angle == -90:
-            self.img = pygame.transform.scale(self.img_face_right, (self.rect.width, self.rect.height))
-
-    def scale_furn_height(self, mouse_relative) -> None:
+        self.rescale_img(preview)
+
+    def scale_furn_height(self, mouse_relative, preview=False) -> None:
         if self.rect.height > mouse_relative[1]:
             self.rect.top += mouse_relative[1]
             self.rect.height -= mouse_relative[1]
-        if self.angle == 0:
-            self.img = pygame.transform.scale(globals()[self.furn_type.upper() + '_IMG'],
-                                              (self.rect.width, self.rect.height))
-        elif self.angle == 180:
-            self.img = pygame.transform.scale(self.img_face_up, (self.rect.width, self.rect.height))
-        elif self.angle == 90:
-            self.img = pygame.transform.scale(self.img_face_left, (self.rect.width, self.rect.height))
-        elif self.angle == -90:
-            self.img = pygame.transform.scale(self.img_face_right, (self.rect.width, self.rect.height))
+        self.rescale_img(preview)
+
+    def rescale_img(self, preview) -> None:
+        if self.angle not in (0, 180, 90, -90):  # free rotations keep their rotozoomed image
+            return
+        if preview:  # nearest-neighbour scale of the small default-size image, smoothed later by finish_transform()
+            self.img = pygame.transform.scale(transformed_image(self.furn_type, int(self.angle), None), self.rect.size)
+            self.pending_resize = True
+        else:
+            self.img = transformed_image(self.furn_type, int(self.angle), self.rect.size)
+            self.rotation_scale = None
+
+    def finish_transform(self) -> None:  # swaps the drag preview for one full-quality resample of the source image
+        if self.pending_rotation_scale is not None:
+            old_center = self.rect.center
+            self.img = pygame.transform.rotozoom(load_image(self.furn_type), self.angle, self.pending_rotation_scale)
+            self.rotation_scale = self.pending_rotation_scale
+            self.rect = self.img.get_rect()
+            self.rect.center = old_center
+        elif self.pending_resize:
+            self.rescale_img(False)
+        self.pending_rotation_scale = None
+        self.pending_resize = False
+
+
+class LayerCache:  # holds a pre-rendered surface and only rebuilds it when its key (sizes, toggles) changes
+    def __init__(self, build_layer):
+        self.build_layer = build_layer  # called with the new key, returns the freshly drawn surface
+        self.layer_key = None
+        self.surface = None
+        self.rebuilds = 0
+
+    def get(self, layer_key) -> pygame.Surface:
+        if self.surface is None or layer_key != self.layer_key:
+            self.surface = self.build_layer(layer_key)
+            self.layer_key = layer_key
+            self.rebuilds += 1
+        return self.surface
+
+    def invalidate(self) -> None:  # forces a rebuild on the next get(), e.g. after the source images change
+        self.surface = None
 
 
 class UserInterface:
@@ -252,200 +626,702 @@ class UserInterface:
         self.btn_door_rect = pygame.Rect(2, 58 + 4 * (btn_height + 4), btn_width, btn_height)
         self.btn_window_rect = pygame.Rect(7 + btn_width, 58 + 4 * (btn_height + 4), btn_width, btn_height)
 
+        # screen area the plan shows in, clear of the panel and the buttons along the bottom
+        self.plan_view_rect = pygame.Rect(self.FURNITURE_PANEL_WIDTH, 0, SCREEN_WIDTH - self.FURNITURE_PANEL_WIDTH,
+                                          SCREEN_HEIGHT - 90)
+
+        self.background_layer = LayerCache(self.build_background_layer)
+        self.panel_layer = LayerCache(self.build_panel_layer)
+
     def draw_user_interface(self) -> None:
         self.draw_furniture_panel()
         pygame.draw.rect(screen, (100, 200, 100), self.btn_add_vertex_rect, 0, 10)
         pygame.draw.rect(screen, (200, 100, 100), self.btn_minus_vertex_rect, 0, 10)
         pygame.draw.rect(screen, (150, 150, 150), self.btn_show_grid_rect, 0, 10)
 
-        f = pygame.font.Font('Fonts/MADEVoyager.otf', 23)
-        text_surface = f.render('Grid', True, (50, 50, 50))
+        text_surface = render_text('Grid', 23, (50, 50, 50))
         screen.blit(text_surface, (self.FURNITURE_PANEL_WIDTH + 29, SCREEN_HEIGHT - 69))
-        text_surface = f.render('Corners:', True, (100, 100, 100))
+        text_surface = render_text('Corners:', 23, (100, 100, 100))
         screen.blit(text_surface, (SCREEN_WIDTH - 240, SCREEN_HEIGHT - 70))
 
-        f = pygame.font.Font('Fonts/MADEVoyager.otf', 80)
-        text_surface = f.render('-', True, (80, 80, 80))
+        text_surface = render_text('-', 80, (80, 80, 80))
         screen.blit(text_surface, (SCREEN_WIDTH - 127, SCREEN_HEIGHT - 114))  # minus sign on button
-        text_surface = f.render('+', True, (80, 80, 80))
+        text_surface = render_text('+', 80, (80, 80, 80))
         screen.blit(text_surface, (SCREEN_WIDTH - 66, SCREEN_HEIGHT - 110))  # plus sign on button
 
-    def draw_grid(self) -> None:
-        pixel_gap = 20
-        num_horizontal_lines = SCREEN_HEIGHT // pixel_gap + 1  # an extra just in case
-        num_vertical_lines = (SCREEN_WIDTH - self.FURNITURE_PANEL_WIDTH) // pixel_gap + 1
+    def draw_background(self, show_grid) -> None:  # background color and grid come from one cached layer
+        grid_key = None
+        if show_grid:  # the grid is pinned to the world, so panning or zooming moves it and rebuilds the layer
+            pixel_gap = GRID_GAP * camera.zoom
+            while pixel_gap < 10:  # keep the lines from piling up when zoomed far out
+                pixel_gap *= 2
+            grid_key = (pixel_gap, round(-camera.offset_x * camera.zoom % pixel_gap, 2),
+                        round(-camera.offset_y * camera.zoom % pixel_gap, 2))
+        layer_key = (SCREEN_WIDTH, SCREEN_HEIGHT, self.FURNITURE_PANEL_WIDTH, grid_key)
+        screen.blit(self.background_layer.get(layer_key), (0, 0))
+
+    def build_background_layer(self, layer_key) -> pygame.Surface:
+        surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        surface.fill(SCREEN_BACKGROUND_COLOR)
+        if layer_key[3] is not None:  # show_grid
+            with profiler.phase('draw_grid'):
+                self.draw_grid(surface, layer_key[3])
+        return surface
+
+    def draw_grid(self, surface, grid_key) -> None:
+        pixel_gap, phase_x, phase_y = grid_key  # line spacing on screen, and where the first line would be
+        first_vertical = math.ceil((self.FURNITURE_PANEL_WIDTH - phase_x) / pixel_gap)
+        num_horizontal_lines = int((SCREEN_HEIGHT - phase_y) // pixel_gap) + 1
+        num_vertical_lines = int((SCREEN_WIDTH - phase_x) // pixel_gap) + 1 - first_vertical
         for i in range(0, num_horizontal_lines):
-            pygame.draw.line(screen, (225, 225, 225), (self.FURNITURE_PANEL_WIDTH, i * pixel_gap),
-                             (SCREEN_WIDTH, i * pixel_gap))
-        for i in range(0, num_vertical_lines):
-            pygame.draw.line(screen, (225, 225, 225), (self.FURNITURE_PANEL_WIDTH + i * pixel_gap, 0),
-                             (self.FURNITURE_PANEL_WIDTH + i * pixel_gap, SCREEN_HEIGHT))
-
-    def draw_furniture_panel(self) -> None:
+            y_pos = round(phase_y + i * pixel_gap)
+            pygame.draw.line(surface, (225, 225, 225), (self.FURNITURE_PANEL_WIDTH, y_pos), (SCREEN_WIDTH, y_pos))
+        for i in range(first_vertical, first_vertical + num_vertical_lines):
+            x_pos = round(phase_x + i * pixel_gap)
+            pygame.draw.line(surface, (225, 225, 225), (x_pos, 0), (x_pos, SCREEN_HEIGHT))
+
+    def draw_furniture_panel(self) -> None:  # the panel never changes, so it's one blit of a cached layer
+        layer_key = (SCREEN_HEIGHT, self.FURNITURE_PANEL_WIDTH)
+        screen.blit(self.panel_layer.get(layer_key), (0, 0))
+
+    def build_panel_layer(self, layer_key) -> pygame.Surface:
+        surface = pygame.Surface((self.FURNITURE_PANEL_WIDTH + 2, SCREEN_HEIGHT)).convert()
         rect = pygame.Rect(0, 0, self.FURNITURE_PANEL_WIDTH, SCREEN_HEIGHT)  # background gray of the panel
-        pygame.draw.rect(screen, (230, 230, 230), rect)
+        pygame.draw.rect(surface, (230, 230, 230), rect)
         rect = pygame.Rect(self.FURNITURE_PANEL_WIDTH, 0, 2, SCREEN_HEIGHT)  # vertical line isolates panel
-        pygame.draw.rect(screen, (120, 120, 120), rect)
+        pygame.draw.rect(surface, (120, 120, 120), rect)
         rect = pygame.Rect(self.FURNITURE_PANEL_WIDTH // 2, 55, 2, SCREEN_HEIGHT)  # vert line separates panel in half
-        pygame.draw.rect(screen, (180, 180, 180), rect)
+        pygame.draw.rect(surface, (180, 180, 180), rect)
         rect = pygame.Rect(0, 55, self.FURNITURE_PANEL_WIDTH, 2)  # top horizontal line to separate text
-        pygame.draw.rect(screen, (120, 120, 120), rect)
+        pygame.draw.rect(surface, (120, 120, 120), rect)
 
-        f = pygame.font.Font('Fonts/MADEVoyager.otf', 35)
-        text_surface = f.render('Furniture', True, (100, 100, 100))
-        screen.blit(text_surface, (130, 5))  # arbitrary positioning numbers
+        text_surface = render_text('Furniture', 35, (100, 100, 100))
+        surface.blit(text_surface, (130, 5))  # arbitrary positioning numbers
 
         section_height = (SCREEN_HEIGHT - 55) // 5  # 55px is how far the separating line is from the top
         for i in range(1, 5):  # draws 4 lines to make 10 furniture piece sections
             rect = pygame.Rect(0, 55 + section_height * i, self.FURNITURE_PANEL_WIDTH, 2)
-            pygame.draw.rect(screen, (180, 180, 180), rect)
-
-        # drawing the furniture images:
-        screen.blit(pygame.transform.scale_by(BED_IMG, .3), (40, 72))
-        screen.blit(pygame.transform.scale_by(DESK_IMG, .16), (222, 104))
-        screen.blit(pygame.transform.scale_by(NIGHTSTAND_IMG, .18), (43, 286))
-        screen.blit(pygame.transform.scale_by(RUG_IMG, .15), (228, 290))
-        screen.blit(pygame.transform.scale_by(DRESSER_IMG, .151), (27, 470))
-        screen.blit(pygame.transform.scale_by(CHAIR_IMG, .18), (248, 470))
-        screen.blit(pygame.transform.scale_by(TV_IMG, .16), (18, 652))
-        screen.blit(pygame.transform.scale_by(LAMP_IMG, .212), (246, 634))
-        screen.blit(pygame.transform.scale_by(DOOR_IMG, .172), (18, 854))
-        screen.blit(pygame.transform.scale_by(WINDOW_IMG, .175), (228, 864))
+            pygame.draw.rect(surface, (180, 180, 180), rect)
 
+        # drawing the furniture images, pre-scaled in the atlas so the full-size ones aren't needed yet:
+        for furn_type, (scale, pos) in PANEL_ICONS.items():
+            surface.blit(atlas.thumbnail(furn_type, scale), pos)
+        return surface
 
-pygame.init()
-pygame.display.set_caption('Room Planner')
 
 SCREEN_WIDTH = 1500
 SCREEN_HEIGHT = 960
 SCREEN_BACKGROUND_COLOR = (250, 250, 245)
-
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+GRID_GAP = 20  # world pixels between grid lines
 
 VERTEX_RADIUS = 7
+PLAN_PATH = 'myRoom.rplan'  # default save file, next to the myRoom.png screenshot
+TRACE_PATH = 'trace.json'  # where F4 writes the profiler's Chrome trace
+HUD_FONT_SIZE = 18
+DEFAULT_ROOM_CORNERS = [(650, 100), (1118, 100), (1118, 688), (866, 688), (866, 788), (650, 788)]
 PIXELS_PER_INCH = 4  # (4px = 1in)
 
-BED_IMG = pygame.image.load('Graphics/Bed.png').convert_alpha()
-DESK_IMG = pygame.image.load('Graphics/Desk.png').convert_alpha()
-NIGHTSTAND_IMG = pygame.image.load('Graphics/Nightstand.png').convert_alpha()
-RUG_IMG = pygame.image.load('Graphics/Rug.png').convert_alpha()
-DRESSER_IMG = pygame.image.load('Graphics/Dresser.png').convert_alpha()
-CHAIR_IMG = pygame.image.load('Graphics/Chair.png').convert_alpha()
-TV_IMG = pygame.image.load('Graphics/TV.png').convert_alpha()
-LAMP_IMG = pygame.image.load('Graphics/Lamp.png').convert_alpha()
-DOOR_IMG = pygame.image.load('Graphics/Door.png').convert_alpha()
-WINDOW_IMG = pygame.image.load('Graphics/Window.png').convert_alpha()
-
-clock = pygame.time.Clock()
-
-SCREEN_UPDATE = pygame.USEREVENT
-pygame.time.set_timer(SCREEN_UPDATE, 150)
-
-room = Room()
-ui = UserInterface()
-active_vertex_index = -1
-active_furniture_index = -1
-rotate_furn_btn_held = False
-width_furn_btn_held = False
-height_furn_btn_held = False
-draw_furn_overlay = False
-show_grid_bool = True
-while True:
-    for event in pygame.event.get():
+DIRTY_RECT_RENDERING = True  # False goes back to redrawing the whole screen 75 times a second
+PROGRESSIVE_QUALITY = True  # quick previews while rotating/resizing, one high-quality resample on release
+LIVE_COLLISIONS = True  # outline what a dragged, resized or rotated piece runs into while the mouse is held
+COLLISION_COLOR = (220, 40, 40)
+LAYOUT_BUDGET = 1.0  # seconds Ctrl+L spends searching for a layout, on every core
+DIRTY_MARGIN = 64  # extra pixels around a changed object so its overlay buttons and dimension labels get redrawn too
+
+screen = None  # the display surface, created by init_display()
+atlas = SpriteAtlas(os.path.join(ASSET_DIR, 'Graphics'), FURNITURE_TYPES + OVERLAY_ICONS,
+                    [(furn_type, scale) for furn_type, (scale, _) in PANEL_ICONS.items()])  # opened by init_display()
+camera = Camera((0, 0, SCREEN_WIDTH, SCREEN_HEIGHT))  # pan/zoom of the plan, shared by all the drawing code
+profiler = FrameProfiler()  # off until F3 turns on the HUD
+
+
+def init_display(headless=False) -> None:
+    # nothing touches the display at import time, so tools like benchmark.py can import this module and pick
+    # SDL's dummy video driver first. images can only be converted once the display mode is set
+    global screen
+    if headless:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.init()
+    pygame.display.set_caption('Room Planner')
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    atlas.open()  # just the atlas's index, sprites are made when they're first drawn
+
+
+def coalesce_motion(events) -> list:
+    # merges each run of back-to-back MOUSEMOTION events into one, so a frame only ever handles the latest pointer
+    # position. rel is summed so drags still end up in the same place
+    coalesced = []
+    for event in events:
+        if event.type == pygame.MOUSEMOTION and coalesced and coalesced[-1].type == pygame.MOUSEMOTION:
+            previous = coalesced[-1]
+            rel = (previous.rel[0] + event.rel[0], previous.rel[1] + event.rel[1])
+            coalesced[-1] = pygame.event.Event(pygame.MOUSEMOTION, pos=event.pos, rel=rel, buttons=event.buttons)
+        else:
+            coalesced.append(event)
+    return coalesced
+
+
+def save_building(building, path) -> None:  # binary unless the path ends in .json
+    write_plan(path, [[room.plan_record() for room in floor.rooms] for floor in building.floors], FURNITURE_TYPES)
+
+
+def furniture_sizes() -> dict:  # type -> default (width, height), the sizes the layout solver works with
+    return {furn_type: transformed_image(furn_type, 0, None).get_size() for furn_type in FURNITURE_TYPES}
+
+
+def furniture_from_placement(placement) -> Furniture:  # a piece where the layout solver put it
+    furn_type, center_x, center_y, width, height, angle = placement
+    if angle in (0, 90, 180, -90):
+        width, height = round(width), round(height)
+        if angle in (90, -90):
+            width, height = height, width
+        return Furniture(furn_type, (round(center_x - width / 2), round(center_y - height / 2), width, height), angle)
+    # a door or window in a slanted wall, turned the way the rotate button would turn it at its size
+    return Furniture(furn_type, bounding_rect(box_corners((center_x, center_y), (width, height), angle)), angle,
+                     width / load_image(furn_type).get_width())
+
+
+def load_building(path) -> Building:
+    # pieces come back with their rects and angles only. their images are made the first time they're drawn, so
+    # opening a big plan costs a pass over the numbers and one bulk fill of each room's indexes
+    floors = []
+    room = None
+    pieces = []
+    for kind, data in read_plan(path):
+        if kind in ('floor', 'room') and room is not None:  # the previous room has all its pieces now
+            add_loaded_room(floors[-1], room, pieces)
+            room = None
+            pieces = []
+        if kind == 'floor':
+            floors.append(Floor())
+        elif kind == 'room':
+            if not floors:
+                floors.append(Floor())
+            room = Room(data)
+        elif kind == 'furniture' and room is not None:
+            for furn_type, center_x, center_y, width, height, angle, rotation_scale in data:
+                rect = (center_x - width // 2, center_y - height // 2, width, height)  # same as setting rect.center
+                pieces.append(Furniture(furn_type, rect, angle, rotation_scale))
+    if room is not None:
+        add_loaded_room(floors[-1], room, pieces)
+    return Building(floors)
+
+
+def add_loaded_room(floor, room, pieces) -> None:
+    room.add_furniture_many(pieces)
+    floor.add_room(room)
+
+
+class RoomPlanner:  # the building, the UI and everything the event loop has to remember between frames
+    def __init__(self):
+        self.floor = Floor([Room()])
+        self.building = Building([self.floor])
+        self.room = self.floor.rooms[0]  # the room being edited: corner buttons, drags and the overlay act on it
+        self.ui = UserInterface()
+        self.active_vertex_index = -1
+        self.active_furniture_index = -1
+        self.rotate_furn_btn_held = False
+        self.width_furn_btn_held = False
+        self.height_furn_btn_held = False
+        self.draw_furn_overlay = False
+        self.show_grid_bool = True
+        self.show_interface = True  # furniture panel and buttons, export.py can leave them out
+        self.drag_pos = (0, 0)  # unsnapped world position of whatever is being dragged
+        self.drag_start = (0, 0)  # where the dragged vertex center or piece's top left was when the drag began
+        self.drag_room = None  # the dragged piece's room when the drag began
+        self.transform_piece = None  # the piece whose rotate/resize button is held, and its furniture_state() from
+        self.transform_start = None  # when the button was pressed
+        self.history = EditHistory()  # Ctrl+Z / Ctrl+Y
+        self.rel_remainder = (0.0, 0.0)  # fractions of a world pixel left over from zoomed-in resize drags
+        self.panning = False
+        camera.reset()
+        self.dirty_rect_rendering = DIRTY_RECT_RENDERING
+        self.progressive_quality = PROGRESSIVE_QUALITY
+        self.live_collisions = LIVE_COLLISIONS
+        self.collisions = None  # collision.Collisions for the piece being edited, None when nothing is held
+        self.collision_piece = None
+        self.full_redraw = True
+        self.dirty_rects = []
+        self.plan_path = PLAN_PATH  # where Ctrl+S saves and Ctrl+O opens
+        self.show_hud = False  # F3: fps, per-phase frame times and cache stats from the profiler
+        self.hud_rect = pygame.Rect(0, 0, 0, 0)
+        self.scene = None  # the scene.Scene the floor being edited is published to, see publish()
+
+    def publish(self, scene) -> None:  # mirrors the floor into scene, e.g. for tk_renderer, and keeps it there
+        self.scene = scene
+        self.floor.publish(scene)
+
+    def open_plan(self, path) -> None:
+        building = load_building(path)
+        if not building.floors[0].rooms:
+            building.floors[0].add_room(Room())
+        self.building = building
+        self.floor = building.floors[0]
+        self.room = self.floor.rooms[0]
+        self.plan_path = path
+        if self.scene is not None:  # the scene shows the opened plan instead
+            self.scene.clear()
+            self.floor.publish(self.scene)
+        self.history.clear()
+        # nothing held over from the old plan: every drag or transform acts on a piece or vertex of the building
+        # that was just replaced
+        self.active_vertex_index = -1
+        self.active_furniture_index = -1
+        self.rotate_furn_btn_held = False
+        self.width_furn_btn_held = False
+        self.height_furn_btn_held = False
+        self.transform_piece = None
+        self.transform_start = None
+        self.drag_room = None
+        self.draw_furn_overlay = False
+        self.collisions = None
+        self.collision_piece = None
+        self.full_redraw = True
+
+    def run(self) -> None:
+        clock = pygame.time.Clock()
+        self.process_frame(pygame.event.get())  # the first frame only needs the panel thumbnails
+        atlas.start_streaming()  # the full-size sprites are read in while the planner waits for input
+        while True:
+            events = pygame.event.get()
+            if self.dirty_rect_rendering and not self.full_redraw and not self.dirty_rects and not events:
+                # nothing to draw, so sleep until something happens
+                events = [pygame.event.wait()] + pygame.event.get()
+            self.process_frame(events)
+            clock.tick(75)  # the program will never run more than 75 fps
+
+    def process_frame(self, events) -> None:  # one pass of the main loop, minus the waiting
+        profiler.begin_frame()
+        with profiler.phase('events'):
+            for event in coalesce_motion(events):
+                self.handle_event(event)
+        self.render()
+        profiler.end_frame()
+
+    def draw_scene(self) -> None:
+        # only rooms overlapping the area being redrawn (the clip rect, plus a margin for wall labels) are visited,
+        # and each room only draws what's inside that area and on screen
+        area = camera.screen_rect_to_world(screen.get_clip().inflate(DIRTY_MARGIN * 2, DIRTY_MARGIN * 2))
+        area = area.clip(camera.visible_world_rect())
+        rooms = self.floor.rooms_in(area)
+        with profiler.phase('draw_background'):
+            self.ui.draw_background(self.show_grid_bool)
+        with profiler.phase('draw_walls'):
+            for room in rooms:
+                room.draw_walls(area)
+        with profiler.phase('draw_vertices'):
+            for room in rooms:
+                room.draw_vertices(area)
+        with profiler.phase('draw_wall_dimensions'):
+            for room in rooms:
+                room.draw_wall_dimensions(area)
+        with profiler.phase('draw_all_furniture'):
+            for room in rooms:
+                room.draw_all_furniture(area)
+            if self.collisions is not None:
+                self.draw_collisions()
+            if self.draw_furn_overlay:
+                self.room.draw_overlay(self.active_furniture_index)
+        if self.show_interface:
+            with profiler.phase('draw_user_interface'):
+                self.ui.draw_user_interface()
+
+    def render(self) -> None:
+        if self.show_hud and self.dirty_rects:  # the numbers change every frame that draws anything
+            self.dirty_rects.append(self.hud_rect)
+        if self.full_redraw or not self.dirty_rect_rendering:
+            self.draw_scene()
+            if self.show_hud:
+                self.draw_hud()
+            with profiler.phase('display_update'):
+                pygame.display.update()
+        elif self.dirty_rects:  # only redraw (and push to the display) the area that actually changed this frame
+            dirty_area = self.dirty_rects[0].unionall(self.dirty_rects[1:]).clip(screen.get_rect())
+            screen.set_clip(dirty_area)
+            self.draw_scene()
+            if self.show_hud:
+                self.draw_hud()
+            screen.set_clip(None)
+            with profiler.phase('display_update'):
+                pygame.display.update(dirty_area)
+        self.full_redraw = False
+        self.dirty_rects.clear()
+
+    def draw_hud(self) -> None:  # profiler numbers in the top right corner. not cached, they change every frame
+        font = get_font(HUD_FONT_SIZE)
+        text_info = render_text.cache_info()
+        image_info = transformed_image.cache_info()
+        lines = [('fps {:.1f}'.format(profiler.fps()), 'p50 ms', 'p99 ms')]
+        for name, (p50, p99, _) in profiler.summary().items():
+            lines.append((name, '{:.2f}'.format(p50), '{:.2f}'.format(p99)))
+        lines.append(('text cache', '{} hit'.format(text_info.hits), '{} miss'.format(text_info.misses)))
+        lines.append(('sprite cache', '{} hit'.format(image_info.hits), '{} miss'.format(image_info.misses)))
+        lines.append(('layer rebuilds', str(self.ui.background_layer.rebuilds), str(self.ui.panel_layer.rebuilds)))
+
+        line_height = font.get_linesize()
+        self.hud_rect = pygame.Rect(SCREEN_WIDTH - 370, 10, 360, line_height * len(lines) + 12)
+        backdrop = pygame.Surface(self.hud_rect.size, pygame.SRCALPHA)
+        backdrop.fill((255, 255, 255, 215))
+        screen.blit(backdrop, self.hud_rect.topleft)
+        for num, columns in enumerate(lines):
+            y_pos = self.hud_rect.y + 6 + num * line_height
+            for x_pos, text in zip((10, 210, 285), columns):  # arbitrary column positions
+                screen.blit(font.render(text, True, (60, 60, 60)), (self.hud_rect.x + x_pos, y_pos))
+
+    def world_rel(self, rel) -> tuple:  # mouse movement in whole world pixels, carrying the leftover fractions
+        x = rel[0] / camera.zoom + self.rel_remainder[0]
+        y = rel[1] / camera.zoom + self.rel_remainder[1]
+        whole = (round(x), round(y))
+        self.rel_remainder = (x - whole[0], y - whole[1])
+        return whole
+
+    def update_collisions(self, furn_object) -> None:  # call after the piece being edited moves or changes shape
+        if not self.live_collisions:
+            return
+        if self.collisions is not None:
+            self.dirty_rects.append(self.collision_dirty_rect())  # where the old outlines were
+        with profiler.phase('collisions'):
+            self.collisions = check_piece(self.floor, furn_object)
+        self.collision_piece = furn_object
+        self.dirty_rects.append(self.collision_dirty_rect())
+
+    def clear_collisions(self) -> None:
+        if self.collisions is not None:
+            self.dirty_rects.append(self.collision_dirty_rect())
+            self.collisions = None
+            self.collision_piece = None
+
+    def collision_dirty_rect(self) -> pygame.Rect:  # screen area covering every outline draw_collisions() makes
+        found = self.collisions
+        area = self.collision_piece.rect.unionall([other.rect for other in found.pieces + found.zone_pieces])
+        for room, ind in found.walls + found.zone_walls:
+            points = room.geometry.points
+            area.union_ip(bounding_rect((points[ind], points[(ind + 1) % len(points)])))
+        if found.zone is not None:
+            area.union_ip(bounding_rect(found.zone))
+        return camera.world_rect_to_screen(area).inflate(8, 8)
+
+    def draw_collisions(self) -> None:
+        # red outlines on the edited piece and whatever it overlaps, red lines over the walls it crosses, and its
+        # clearance zone, grey while clear and red once something stands in it
+        found = self.collisions
+        blocked_pieces = found.pieces + found.zone_pieces
+        if found.pieces or found.walls:
+            blocked_pieces.append(self.collision_piece)
+        for furn_object in blocked_pieces:
+            pygame.draw.polygon(screen, COLLISION_COLOR, [camera.world_to_screen(corner)
+                                                          for corner in furn_object.footprint()], 2)
+        for room, ind in found.walls + found.zone_walls:
+            points = room.geometry.points
+            pygame.draw.line(screen, COLLISION_COLOR, camera.world_to_screen(points[ind]),
+                             camera.world_to_screen(points[(ind + 1) % len(points)]), 3)
+        if found.zone is not None:
+            zone_color = COLLISION_COLOR if found.zone_pieces or found.zone_walls else (150, 150, 150)
+            pygame.draw.polygon(screen, zone_color, [camera.world_to_screen(corner) for corner in found.zone], 1)
+
+    def auto_layout(self) -> None:  # Ctrl+L: the layout solver rearranges the room's furniture, as one undo step
+        # doors and windows stay where the user put them, everything else moves around them at its current size
+        pieces = []
+        fixed = []
+        for furn_object in self.room.furniture_pieces:
+            if furn_object.furn_type in WALL_MOUNTED:
+                fixed.append((furn_object.furn_type, furn_object.footprint()))
+            else:
+                pieces.append(furn_object)
+        if not pieces or self.dragging():
+            return
+        placements, _ = solve_layout(self.room.wall_polygon(), [furn_object.furn_type for furn_object in pieces],
+                                     [furn_object.size() for furn_object in pieces], fixed, budget=LAYOUT_BUDGET)
+        edits = []
+        for furn_object, placement in zip(pieces, placements):
+            before = furniture_state(furn_object)
+            placed = furniture_from_placement(placement)
+            furn_object.rect, furn_object.angle, furn_object.rotation_scale = placed.rect, placed.angle, \
+                placed.rotation_scale
+            furn_object.img = None  # rebuilt for its new size and angle when it's next drawn
+            self.room.furniture_changed(furn_object)
+            edits.append((TRANSFORM_FURNITURE, self.room, furn_object, before, furniture_state(furn_object)))
+        self.history.record((GROUP, edits))
+        self.floor.room_changed(self.room)
+        self.draw_furn_overlay = False
+        self.full_redraw = True
+
+    def add_new_furniture(self, f_type) -> None:  # the furniture panel buttons
+        view = self.ui.plan_view_rect if self.show_interface else camera.view_rect
+        furn_object = Furniture(f_type, center=self.room.spawn_point(camera.screen_rect_to_world(view)))
+        self.history.record((ADD_FURNITURE, self.floor.add_furniture(furn_object, self.room), furn_object))
+
+    def dragging(self) -> bool:  # undo/redo wait until the mouse is let go
+        return self.active_vertex_index != -1 or self.active_furniture_index != -1 or self.transform_held()
+
+    def transform_held(self) -> bool:  # a rotate, width or height button of the top piece is held down
+        return self.rotate_furn_btn_held or self.width_furn_btn_held or self.height_furn_btn_held
+
+    def undo(self) -> None:
+        if not self.dragging():
+            entry = self.history.undo()
+            if entry is not None:
+                self.apply_edit(entry, True)
+
+    def redo(self) -> None:
+        if not self.dragging():
+            entry = self.history.redo()
+            if entry is not None:
+                self.apply_edit(entry, False)
+
+    def apply_edit(self, entry, undo) -> None:  # reverses a history entry (undo=True) or makes it again
+        kind = entry[0]
+        if kind == GROUP:
+            for grouped_entry in (reversed(entry[1]) if undo else entry[1]):
+                self.apply_edit(grouped_entry, undo)
+            return
+        sign = -1 if undo else 1
+        if kind == MOVE_VERTEX:
+            _, room, ind, dx, dy = entry
+            room.wall_vertices[ind].rect.move_ip(dx * sign, dy * sign)
+            room.vertex_moved(ind)
+            changed_rooms = (room,)
+        elif kind == ADD_VERTEX or kind == REMOVE_VERTEX:
+            _, room, pos = entry
+            if (kind == ADD_VERTEX) != undo:
+                room.add_vertex(pos)
+            else:
+                room.minus_vertex()
+            changed_rooms = (room,)
+        elif kind == MOVE_FURNITURE:
+            _, furn_object, old_room, new_room, dx, dy = entry
+            from_room, to_room = (new_room, old_room) if undo else (old_room, new_room)
+            furn_object.rect.move_ip(dx * sign, dy * sign)
+            if from_room is to_room:
+                from_room.furniture_changed(furn_object)
+            else:
+                from_room.delete_furniture(from_room.piece_index(furn_object))
+                to_room.add_furniture(furn_object)
+            changed_rooms = (from_room, to_room)
+        elif kind == TRANSFORM_FURNITURE:
+            _, room, furn_object, before, after = entry
+            rect, furn_object.angle, furn_object.rotation_scale = before if undo else after
+            furn_object.rect = pygame.Rect(rect)
+            furn_object.img = None  # rebuilt from the restored rect, angle and scale when it's next drawn
+            room.furniture_changed(furn_object)
+            changed_rooms = (room,)
+        else:  # ADD_FURNITURE or DELETE_FURNITURE
+            room, furn_object = entry[1], entry[2]
+            if (kind == ADD_FURNITURE) == undo:
+                room.delete_furniture(room.piece_index(furn_object))
+                furn_object.img = None
+            elif kind == DELETE_FURNITURE:
+                room.insert_furniture(furn_object, entry[3])  # back where it was in the stacking order
+            else:
+                room.add_furniture(furn_object)
+            changed_rooms = (room,)
+
+        for room in changed_rooms:
+            self.floor.room_changed(room)
+        self.draw_furn_overlay = False  # the overlay belongs to whatever piece is on top, which may have changed
+        self.full_redraw = True
+
+    def handle_event(self, event) -> None:
         if event.type == pygame.QUIT:
             pygame.quit()
             exit()
 
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+            self.full_redraw = True
+
+        if event.type == pygame.MOUSEWHEEL:  # zoom around the mouse pointer
+            if camera.zoom_at(pygame.mouse.get_pos(), event.y):
+                self.full_redraw = True
+
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_HOME:  # back to the original view
+            camera.reset()
+            self.full_redraw = True
+
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:  # profiler HUD, profiling only runs while it's up
+            self.show_hud = not self.show_hud
+            profiler.enabled = self.show_hud
+            self.full_redraw = True
+
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:  # what the profiler has recorded so far
+            profiler.export_chrome_trace(TRACE_PATH)
+
+        if event.type == pygame.KEYDOWN and event.mod & pygame.KMOD_CTRL:
+            if event.key == pygame.K_s:
+                save_building(self.building, self.plan_path)
+            elif event.key == pygame.K_o and os.path.exists(self.plan_path) and not self.dragging():
+                self.open_plan(self.plan_path)
+            elif event.key == pygame.K_z and not event.mod & pygame.KMOD_SHIFT:
+                self.undo()
+            elif event.key == pygame.K_y or event.key == pygame.K_z:  # Ctrl+Y or Ctrl+Shift+Z
+                self.redo()
+            elif event.key == pygame.K_l:
+                self.auto_layout()
+
         if event.type == pygame.MOUSEBUTTONDOWN:
+            if event.button in (2, 3):  # middle or right drag pans the plan
+                self.panning = True
             if event.button == 1:
-                if len(room.furniture_pieces) > 0:
-                    if room.furniture_pieces[len(room.furniture_pieces) - 1].delete_btn_rect.collidepoint(event.pos):
-                        room.delete_furniture(len(room.furniture_pieces) - 1)
-                        draw_furn_overlay = False
-                    elif room.furniture_pieces[len(room.furniture_pieces) - 1].rotate_btn_rect.collidepoint(event.pos):
-                        rotate_furn_btn_held = True
-                    elif room.furniture_pieces[len(room.furniture_pieces) - 1].width_btn_rect.collidepoint(event.pos):
-                        width_furn_btn_held = True
-                    elif room.furniture_pieces[len(room.furniture_pieces) - 1].height_btn_rect.collidepoint(event.pos):
-                        height_furn_btn_held = True
+                self.full_redraw = True  # clicks can add/delete things or toggle the grid and overlay, so redraw it all
+                world_pos = camera.screen_to_world(event.pos)
+                if len(self.room.furniture_pieces) > 0:
+                    top_piece = self.room.furniture_pieces[len(self.room.furniture_pieces) - 1]
+                    if top_piece.delete_btn_rect.collidepoint(event.pos):
+                        self.history.record((DELETE_FURNITURE, self.room, top_piece, self.room.furniture_z(top_piece)))
+                        self.room.delete_furniture(len(self.room.furniture_pieces) - 1)
+                        top_piece.img = None  # the history only keeps its numbers, the image is rebuilt on undo
+                        self.floor.room_changed(self.room)
+                        self.draw_furn_overlay = False
+                    elif top_piece.rotate_btn_rect.collidepoint(event.pos):
+                        self.rotate_furn_btn_held = True
+                    elif top_piece.width_btn_rect.collidepoint(event.pos):
+                        self.width_furn_btn_held = True
+                    elif top_piece.height_btn_rect.collidepoint(event.pos):
+                        self.height_furn_btn_held = True
                     else:
-                        draw_furn_overlay = False  # turns off the overlay if the user clicks anywhere besides it
-
-                for num, vertex in enumerate(room.wall_vertices):
-                    if vertex.rect.collidepoint(event.pos):
-                        active_vertex_index = num
-                if active_vertex_index == -1 and not rotate_furn_btn_held:  # only checks furniture if nothing is held
-                    for num, furniture in enumerate(room.furniture_pieces):
-                        if furniture.rect.collidepoint(event.pos):
-                            active_furniture_index = num
-                            active_furniture_index = room.bring_furn_to_top(active_furniture_index)
-                            draw_furn_overlay = True
-
-                if ui.btn_add_vertex_rect.collidepoint(event.pos):
-                    room.add_vertex()
-                if ui.btn_minus_vertex_rect.collidepoint(event.pos):
-                    room.minus_vertex()
-                if ui.btn_show_grid_rect.collidepoint(event.pos):
-                    show_grid_bool = not show_grid_bool
-
-                if ui.btn_bed_rect.collidepoint(event.pos):
-                    room.add_furniture(Furniture('Bed'))
-                if ui.btn_desk_rect.collidepoint(event.pos):
-                    room.add_furniture(Furniture('Desk'))
-                if ui.btn_nightstand_rect.collidepoint(event.pos):
-                    room.add_furniture(Furniture('Nightstand'))
-                if ui.btn_rug_rect.collidepoint(event.pos):
-                    room.add_furniture(Furniture('Rug'))
-                if ui.btn_dresser_rect.collidepoint(event.pos):
-                    room.add_furniture(Furniture('Dresser'))
-                if ui.btn_chair_rect.collidepoint(event.pos):
-                    room.add_furniture(Furniture('Chair'))
-                if ui.btn_tv_rect.collidepoint(event.pos):
-                    room.add_furniture(Furniture('TV'))
-                if ui.btn_lamp_rect.collidepoint(event.pos):
-                    room.add_furniture(Furniture('Lamp'))
-                if ui.btn_door_rect.collidepoint(event.pos):
-                    room.add_furniture(Furniture('Door'))
-                if ui.btn_window_rect.collidepoint(event.pos):
-                    room.add_furniture(Furniture('Window'))
+                        self.draw_furn_overlay = False  # turns off the overlay if the user clicks anywhere besides it
+
+                    if self.transform_held():
+                        self.transform_piece = top_piece
+                        self.transform_start = furniture_state(top_piece)
+
+                # only the rooms under the click are asked, and whichever one is hit becomes the room being edited.
+                # a held rotate/resize button keeps the piece it belongs to, whatever is under it
+                if not self.transform_held():
+                    clicked_room, self.active_vertex_index = self.floor.vertex_at(world_pos,
+                                                                                  VERTEX_RADIUS / camera.zoom)
+                if self.active_vertex_index != -1:
+                    self.room = clicked_room
+                    self.drag_pos = self.room.wall_vertices[self.active_vertex_index].rect.center
+                    self.drag_start = self.drag_pos
+                # only checks furniture if nothing is held
+                if self.active_vertex_index == -1 and not self.transform_held():
+                    clicked_room, clicked_index = self.floor.furniture_at(world_pos)
+                    if clicked_index != -1:
+                        self.room = clicked_room
+                        self.active_furniture_index = self.room.bring_furn_to_top(clicked_index)
+                        self.drag_pos = self.room.furniture_pieces[self.active_furniture_index].rect.topleft
+                        self.drag_start = self.drag_pos
+                        self.drag_room = self.room
+                        self.draw_furn_overlay = True
+
+                if self.ui.btn_add_vertex_rect.collidepoint(event.pos):
+                    self.room.add_vertex()
+                    self.floor.room_changed(self.room)
+                    self.history.record((ADD_VERTEX, self.room, self.room.wall_vertices[-1].rect.center))
+                if self.ui.btn_minus_vertex_rect.collidepoint(event.pos) and len(self.room.wall_vertices) > 2:
+                    self.history.record((REMOVE_VERTEX, self.room, self.room.wall_vertices[-1].rect.center))
+                    self.room.minus_vertex()
+                    self.floor.room_changed(self.room)
+                if self.ui.btn_show_grid_rect.collidepoint(event.pos):
+                    self.show_grid_bool = not self.show_grid_bool
+
+                if self.ui.btn_bed_rect.collidepoint(event.pos):
+                    self.add_new_furniture('Bed')
+                if self.ui.btn_desk_rect.collidepoint(event.pos):
+                    self.add_new_furniture('Desk')
+                if self.ui.btn_nightstand_rect.collidepoint(event.pos):
+                    self.add_new_furniture('Nightstand')
+                if self.ui.btn_rug_rect.collidepoint(event.pos):
+                    self.add_new_furniture('Rug')
+                if self.ui.btn_dresser_rect.collidepoint(event.pos):
+                    self.add_new_furniture('Dresser')
+                if self.ui.btn_chair_rect.collidepoint(event.pos):
+                    self.add_new_furniture('Chair')
+                if self.ui.btn_tv_rect.collidepoint(event.pos):
+                    self.add_new_furniture('TV')
+                if self.ui.btn_lamp_rect.collidepoint(event.pos):
+                    self.add_new_furniture('Lamp')
+                if self.ui.btn_door_rect.collidepoint(event.pos):
+                    self.add_new_furniture('Door')
+                if self.ui.btn_window_rect.collidepoint(event.pos):
+                    self.add_new_furniture('Window')
 
         if event.type == pygame.MOUSEBUTTONUP:
+            if event.button in (2, 3):
+                self.panning = False
             if event.button == 1:
-                active_vertex_index = -1
-                active_furniture_index = -1
-                rotate_furn_btn_held = False
-                width_furn_btn_held = False
-                height_furn_btn_held = False
+                if self.transform_piece is not None:
+                    piece = self.transform_piece
+                    self.dirty_rects.append(piece.dirty_rect())
+                    piece.finish_transform()
+                    self.room.furniture_changed(piece)
+                    self.floor.room_changed(self.room)
+                    self.dirty_rects.append(piece.dirty_rect())
+                    if furniture_state(piece) != self.transform_start:
+                        self.history.record((TRANSFORM_FURNITURE, self.room, piece, self.transform_start,
+                                             furniture_state(piece)))
+                if self.active_furniture_index != -1:  # a dropped piece belongs to whichever room it ended up in
+                    active_piece = self.room.furniture_pieces[self.active_furniture_index]
+                    self.room = self.floor.reassign_furniture(active_piece, self.room)
+                    # the whole drag is one history entry, however many motion events it took
+                    move = (active_piece.rect.x - self.drag_start[0], active_piece.rect.y - self.drag_start[1])
+                    if move != (0, 0) or self.room is not self.drag_room:
+                        self.history.record((MOVE_FURNITURE, active_piece, self.drag_room, self.room, move[0], move[1]))
+                if self.active_vertex_index != -1:
+                    center = self.room.wall_vertices[self.active_vertex_index].rect.center
+                    if center != self.drag_start:
+                        self.history.record((MOVE_VERTEX, self.room, self.active_vertex_index,
+                                             center[0] - self.drag_start[0], center[1] - self.drag_start[1]))
+                self.active_vertex_index = -1
+                self.active_furniture_index = -1
+                self.rotate_furn_btn_held = False
+                self.width_furn_btn_held = False
+                self.height_furn_btn_held = False
+                self.transform_piece = None
+                self.transform_start = None
+                self.clear_collisions()
 
         if event.type == pygame.MOUSEMOTION:
-            if active_vertex_index != -1:
-                room.wall_vertices[active_vertex_index].rect.move_ip(event.rel)
-                for index in range(0, len(room.wall_vertices)):     # this for loop handles the vertex snapping
-                    if (room.wall_vertices[index].rect.x - 10 < room.wall_vertices[active_vertex_index].rect.x
-                            < room.wall_vertices[index].rect.x + 10):
-                        room.wall_vertices[active_vertex_index].rect.x = room.wall_vertices[index].rect.x
-                    if (room.wall_vertices[index].rect.y - 10 < room.wall_vertices[active_vertex_index].rect.y
-                            < room.wall_vertices[index].rect.y + 10):
-                        room.wall_vertices[active_vertex_index].rect.y = room.wall_vertices[index].rect.y
-
-            elif active_furniture_index != -1:
-                room.furniture_pieces[active_furniture_index].rect.move_ip(event.rel)
-            elif rotate_furn_btn_held:
-                room.furniture_pieces[len(room.furniture_pieces) - 1].rotate_furniture(event.pos)
-            elif width_furn_btn_held:
-                room.furniture_pieces[len(room.furniture_pieces) - 1].scale_furn_width(event.rel)
-            elif height_furn_btn_held:
-                room.furniture_pieces[len(room.furniture_pieces) - 1].scale_furn_height(event.rel)
-
-    screen.fill(SCREEN_BACKGROUND_COLOR)
-
-    if show_grid_bool:
-        ui.draw_grid()
-    room.draw_walls()
-    room.draw_vertices()
-    room.draw_wall_dimensions()
-    room.draw_all_furniture(draw_furn_overlay, active_furniture_index)
-    ui.draw_user_interface()
-
-    pygame.display.update()
-    clock.tick(75)  # the program will never run more than 75 fps
+            if self.panning:
+                camera.pan(event.rel)
+                self.full_redraw = True
+            elif self.active_vertex_index != -1:
+                self.dirty_rects.append(self.room.vertex_dirty_rect(self.active_vertex_index))
+                # drag_pos follows the mouse without snapping, so a snapped vertex can still be pulled free slowly
+                self.drag_pos = (self.drag_pos[0] + event.rel[0] / camera.zoom,
+                                 self.drag_pos[1] + event.rel[1] / camera.zoom)
+                snapped_pos = self.room.snap_vertex(self.active_vertex_index, self.drag_pos)
+                self.room.wall_vertices[self.active_vertex_index].rect.center = (round(snapped_pos[0]),
+                                                                                 round(snapped_pos[1]))
+                self.room.vertex_moved(self.active_vertex_index)
+                self.floor.room_changed(self.room)
+                self.dirty_rects.append(self.room.vertex_dirty_rect(self.active_vertex_index))
+
+            elif self.active_furniture_index != -1:
+                active_piece = self.room.furniture_pieces[self.active_furniture_index]
+                self.dirty_rects.append(active_piece.dirty_rect())
+                self.drag_pos = (self.drag_pos[0] + event.rel[0] / camera.zoom,
+                                 self.drag_pos[1] + event.rel[1] / camera.zoom)
+                active_piece.rect.topleft = (round(self.drag_pos[0]), round(self.drag_pos[1]))
+                active_piece.rect.topleft = self.room.snap_furniture(active_piece, active_piece.rect)
+                self.room.furniture_changed(active_piece)
+                self.floor.room_changed(self.room)
+                self.dirty_rects.append(active_piece.dirty_rect())
+                self.update_collisions(active_piece)
+            elif self.transform_piece is not None:
+                piece = self.transform_piece
+                self.dirty_rects.append(piece.dirty_rect())
+                if self.rotate_furn_btn_held:
+                    piece.rotate_furniture(camera.screen_to_world(event.pos), self.progressive_quality)
+                elif self.width_furn_btn_held:
+                    piece.scale_furn_width(self.world_rel(event.rel), self.progressive_quality)
+                else:
+                    piece.scale_furn_height(self.world_rel(event.rel), self.progressive_quality)
+                self.room.furniture_changed(piece)
+                self.floor.room_changed(self.room)
+                self.dirty_rects.append(piece.dirty_rect())
+                self.update_collisions(piece)
+
+
+def main() -> None:  # python main.py [plan file]
+    init_display()
+    app = RoomPlanner()
+    if len(argv) > 1:
+        if os.path.exists(argv[1]):
+            app.open_plan(argv[1])
+        app.plan_path = argv[1]
+    app.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+# Save/load format used by the Room Planner.
+# Desc: Writes a building (floors -> rooms -> wall corners and furniture) either as compact binary or as JSON lines,
+#       and reads either one back as a stream of records, so a plan with tens of thousands of pieces never has to
+#       be held in memory twice. It only deals in plain numbers and type names; main.py turns them into Rooms and
+#       Furniture. A furniture record is (type, center x, center y, width, height, angle, rotation scale or None),
+#       and each room lists its pieces bottom to top, so their order is the z-order.
+#
+# Binary layout (little-endian):
+#   b'RPLN', uint16 format version, uint16 number of furniture types, then each type name (uint8 length + utf-8)
+#   then any number of records, each starting with a uint8 tag:
+#     FLOOR_TAG  a new floor, the rooms that follow are on it
+#     ROOM_TAG   uint32 corner count, uint32 piece count, the corners as int32 (x, y) pairs, then the pieces as
+#                FURNITURE_DTYPE rows (a rotation scale of NaN means None)
+
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b'RPLN'
+FORMAT_VERSION = 1
+FLOOR_TAG = 1
+ROOM_TAG = 2
+FURNITURE_DTYPE = np.dtype([('type_id', '<u2'), ('center', '<i4', 2), ('size', '<i4', 2), ('angle', '<f8'),
+                            ('rotation_scale', '<f8')])
+CHUNK_SIZE = 4096  # pieces per record handed back by read_plan, and per line in the JSON format
+
+
+def is_json_path(path) -> bool:  # .json/.jsonl files use the text format, anything else is binary
+    return str(path).lower().endswith(('.json', '.jsonl'))
+
+
+def write_plan(path, floors, furniture_types) -> None:
+    # floors is a list of floors, each a list of (corners, furniture records) per room
+    if is_json_path(path):
+        write_json_plan(path, floors)
+    else:
+        write_binary_plan(path, floors, furniture_types)
+
+
+def read_plan(path):
+    # generator of ('floor', None), ('room', corners) and ('furniture', list of records) in file order. a room's
+    # pieces come in one or more 'furniture' records straight after it
+    if is_json_path(path):
+        return read_json_plan(path)
+    return read_binary_plan(path)
+
+
+def write_binary_plan(path, floors, furniture_types) -> None:
+    type_ids = {name: type_id for type_id, name in enumerate(furniture_types)}
+    with open(path, 'wb') as file:
+        file.write(MAGIC + struct.pack('<HH', FORMAT_VERSION, len(furniture_types)))
+        for name in furniture_types:
+            encoded = name.encode('utf-8')
+            file.write(struct.pack('<B', len(encoded)) + encoded)
+        for rooms in floors:
+            file.write(struct.pack('<B', FLOOR_TAG))
+            for corners, furniture in rooms:
+                file.write(struct.pack('<BII', ROOM_TAG, len(corners), len(furniture)))
+                file.write(np.asarray(corners, dtype='<i4').reshape(-1, 2).tobytes())
+                for first in range(0, len(furniture), CHUNK_SIZE):
+                    file.write(pack_furniture(furniture[first:first + CHUNK_SIZE], type_ids).tobytes())
+
+
+def pack_furniture(records, type_ids) -> np.ndarray:
+    rows = np.zeros(len(records), dtype=FURNITURE_DTYPE)
+    if not records:
+        return rows
+    furn_types, center_x, center_y, width, height, angle, rotation_scale = zip(*records)  # one column per field
+    rows['type_id'] = [type_ids[furn_type] for furn_type in furn_types]
+    rows['center'] = np.column_stack((center_x, center_y))
+    rows['size'] = np.column_stack((width, height))
+    rows['angle'] = angle
+    rows['rotation_scale'] = [np.nan if scale is None else scale for scale in rotation_scale]
+    return rows
+
+
+def read_binary_plan(path):
+    with open(path, 'rb') as file:
+        header = file.read(len(MAGIC) + 4)
+        if header[:len(MAGIC)] != MAGIC:
+            raise ValueError('{} is not a Room Planner plan'.format(path))
+        if len(header) != len(MAGIC) + 4:
+            raise ValueError('{} is truncated'.format(path))
+        version, type_count = struct.unpack('<HH', header[len(MAGIC):])
+        if version > FORMAT_VERSION:
+            raise ValueError('{} was saved by a newer version (format {})'.format(path, version))
+        furniture_types = []
+        for _ in range(type_count):
+            length = read_exactly(file, 1, path)[0]
+            furniture_types.append(read_exactly(file, length, path).decode('utf-8'))
+
+        while True:
+            tag = file.read(1)
+            if not tag:
+                return
+            if tag[0] == FLOOR_TAG:
+                yield 'floor', None
+            elif tag[0] == ROOM_TAG:
+                corner_count, piece_count = struct.unpack('<II', read_exactly(file, 8, path))
+                corners = np.frombuffer(read_exactly(file, corner_count * 8, path), dtype='<i4').reshape(-1, 2)
+                yield 'room', [tuple(corner) for corner in corners.tolist()]
+                for first in range(0, piece_count, CHUNK_SIZE):
+                    count = min(CHUNK_SIZE, piece_count - first)
+                    rows = np.frombuffer(read_exactly(file, count * FURNITURE_DTYPE.itemsize, path),
+                                         dtype=FURNITURE_DTYPE)
+                    yield 'furniture', unpack_furniture(rows, furniture_types)
+            else:
+                raise ValueError('{} has an unknown record type {}'.format(path, tag[0]))
+
+
+def read_exactly(file, size, path) -> bytes:  # size bytes, or ValueError if the file ends first
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError('{} is truncated'.format(path))
+    return data
+
+
+def unpack_furniture(rows, furniture_types) -> list:
+    scales = rows['rotation_scale']
+    scales = np.where(np.isnan(scales), None, scales).tolist()  # NaN -> None, numbers -> plain floats
+    return [(furniture_types[type_id], center[0], center[1], size[0], size[1], angle, scale)
+            for type_id, center, size, angle, scale in zip(rows['type_id'].tolist(), rows['center'].tolist(),
+                                                           rows['size'].tolist(), rows['angle'].tolist(), scales)]
+
+
+def write_json_plan(path, floors) -> None:  # JSON lines: one object per line, pieces in chunks of CHUNK_SIZE
+    with open(path, 'w') as file:
+        file.write(json.dumps({'format': 'room-planner', 'version': FORMAT_VERSION}) + '\n')
+        for rooms in floors:
+            file.write('{"floor": {}}\n')
+            for corners, furniture in rooms:
+                file.write(json.dumps({'room': [list(corner) for corner in corners]}) + '\n')
+                for first in range(0, len(furniture), CHUNK_SIZE):
+                    chunk = [list(record) for record in furniture[first:first + CHUNK_SIZE]]
+                    file.write(json.dumps({'furniture': chunk}, separators=(',', ':')) + '\n')
+
+
+def read_json_plan(path):
+    with open(path) as file:
+        header = json.loads(file.readline() or '{}')
+        if header.get('format') != 'room-planner':
+            raise ValueError('{} is not a Room Planner plan'.format(path))
+        if header.get('version', 0) > FORMAT_VERSION:
+            raise ValueError('{} was saved by a newer version (format {})'.format(path, header['version']))
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if 'floor' in record:
+                yield 'floor', None
+            elif 'room' in record:
+                yield 'room', [tuple(corner) for corner in record['room']]
+            elif 'furniture' in record:
+                yield 'furniture', [tuple(piece) for piece in record['furniture']]
@@ -0,0 +1,99 @@
+# Frame profiler used by the Room Planner.
+# Desc: Times each phase of the main loop (event handling, each drawing pass, the display update) into fixed-size
+#       ring buffers, so the HUD can show recent p50/p99 per phase, and keeps a bounded log of every timed span that
+#       can be written out as a Chrome trace-event JSON file (open it in chrome://tracing or ui.perfetto.dev).
+#       While it's turned off, phase() hands back one shared do-nothing context manager, so leaving the
+#       instrumentation in the code costs about a function call per phase.
+
+import contextlib
+import json
+import math
+import time
+from collections import deque
+
+PROFILE_HISTORY = 300  # recent samples kept per phase, about 4 seconds at 75 fps
+TRACE_CAPACITY = 200000  # spans kept for the trace export, the oldest are dropped first
+
+NO_PHASE = contextlib.nullcontext()  # reusable, so a disabled profiler doesn't allocate anything per phase
+
+
+class Phase:  # context manager that times one span and hands it to the profiler
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.profiler.record(self.name, self.start, time.perf_counter())
+
+
+class FrameProfiler:
+    def __init__(self, history=PROFILE_HISTORY, trace_capacity=TRACE_CAPACITY):
+        self.enabled = False
+        self.history = history
+        self.durations = {}  # phase name -> deque of its most recent durations, in seconds
+        self.frame_starts = deque(maxlen=history)
+        self.trace = deque(maxlen=trace_capacity)  # (name, start, duration) for every span, in perf_counter seconds
+        self.origin = time.perf_counter()  # trace timestamps are relative to this
+        self.frame_start = None
+
+    def phase(self, name):  # with profiler.phase('draw_walls'): ...
+        if not self.enabled:
+            return NO_PHASE
+        return Phase(self, name)
+
+    def record(self, name, start, end) -> None:
+        durations = self.durations.get(name)
+        if durations is None:
+            durations = self.durations[name] = deque(maxlen=self.history)
+        durations.append(end - start)
+        self.trace.append((name, start, end - start))
+
+    def begin_frame(self) -> None:
+        if self.enabled:
+            self.frame_start = time.perf_counter()
+            self.frame_starts.append(self.frame_start)
+
+    def end_frame(self) -> None:
+        if self.enabled and self.frame_start is not None:
+            self.record('frame', self.frame_start, time.perf_counter())
+            self.frame_start = None
+
+    def reset(self) -> None:
+        self.durations.clear()
+        self.frame_starts.clear()
+        self.trace.clear()
+        self.frame_start = None
+
+    def fps(self) -> float:  # frames per second over the recent frames, counting idle time between them
+        if len(self.frame_starts) < 2:
+            return 0.0
+        span = self.frame_starts[-1] - self.frame_starts[0]
+        return (len(self.frame_starts) - 1) / span if span else 0.0
+
+    def summary(self) -> dict:  # phase name -> (p50 ms, p99 ms, samples), in the order the phases first ran
+        summary = {}
+        for name, durations in self.durations.items():
+            ordered = sorted(durations)
+            summary[name] = (percentile(ordered, .5) * 1000, percentile(ordered, .99) * 1000, len(ordered))
+        return summary
+
+    def export_chrome_trace(self, path) -> int:  # writes the trace log as complete ('X') events, returns how many
+        events = [{'name': name, 'cat': 'frame', 'ph': 'X', 'pid': 1, 'tid': 1,
+                   'ts': round((start - self.origin) * 1e6, 1), 'dur': round(duration * 1e6, 1)}
+                  for name, start, duration in self.trace]
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+        return len(events)
+
+
+def percentile(sorted_values, fraction) -> float:  # nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))]
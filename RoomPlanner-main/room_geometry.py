@@ -0,0 +1,106 @@
+# Cached wall geometry used by the Room Planner.
+# Desc: Keeps the room outline (the wall vertex centers, in order) along with each wall's length and midpoint and
+#       running totals for the perimeter and area. Moving, adding or removing a vertex only recalculates the two
+#       walls that touch it and adjusts the totals, so labels, reports and layout checks read cached numbers instead
+#       of re-measuring every wall. The version counter goes up on every change, so callers can key caches on it.
+
+import math
+
+
+class RoomGeometry:
+    def __init__(self, points):
+        self.points = [tuple(point) for point in points]  # vertex centers, wall i runs from point i to point i + 1
+        self.lengths = []  # wall index -> length in world pixels
+        self.midpoints = []  # wall index -> midpoint in whole pixels (rounded down)
+        self.total_length = 0.0
+        self.twice_area = 0  # shoelace sum, kept exact because vertex centers are whole pixels
+        self.version = 0
+        self.rebuild()
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def rebuild(self) -> None:  # measures every wall from scratch
+        self.lengths = []
+        self.midpoints = []
+        self.twice_area = 0
+        for ind in range(len(self.points)):
+            self.lengths.append(0.0)
+            self.midpoints.append((0, 0))
+            self.measure_wall(ind)
+            self.twice_area += self.cross(ind)
+        self.total_length = math.fsum(self.lengths)
+        self.version += 1
+
+    def next_index(self, ind) -> int:
+        return (ind + 1) % len(self.points)
+
+    def cross(self, ind) -> int:  # this wall's term of the shoelace sum
+        x1, y1 = self.points[ind]
+        x2, y2 = self.points[self.next_index(ind)]
+        return x1 * y2 - x2 * y1
+
+    def measure_wall(self, ind) -> None:
+        x1, y1 = self.points[ind]
+        x2, y2 = self.points[self.next_index(ind)]
+        self.lengths[ind] = math.hypot(x2 - x1, y2 - y1)
+        self.midpoints[ind] = ((x1 + x2) // 2, (y1 + y2) // 2)
+
+    def forget_walls(self, walls) -> None:  # takes the walls out of the totals before their end points change
+        for ind in walls:
+            self.total_length -= self.lengths[ind]
+            self.twice_area -= self.cross(ind)
+
+    def remeasure_walls(self, walls) -> None:  # puts the walls back into the totals once their end points are set
+        for ind in walls:
+            self.measure_wall(ind)
+            self.total_length += self.lengths[ind]
+            self.twice_area += self.cross(ind)
+        self.version += 1
+
+    def move_point(self, ind, point) -> None:
+        point = tuple(point)
+        if point == self.points[ind]:
+            return
+        walls = {ind - 1 if ind else len(self.points) - 1, ind}  # the wall ending at the vertex and the one leaving it
+        self.forget_walls(walls)
+        self.points[ind] = point
+        self.remeasure_walls(walls)
+
+    def append_point(self, point) -> None:  # adds a vertex between the last one and the first
+        last = len(self.points) - 1
+        self.forget_walls([last])
+        self.points.append(tuple(point))
+        self.lengths.append(0.0)
+        self.midpoints.append((0, 0))
+        self.remeasure_walls([last, last + 1])
+
+    def pop_point(self) -> None:  # removes the last vertex, joining its neighbours with one wall
+        last = len(self.points) - 1
+        self.forget_walls([last - 1, last])
+        self.points.pop()
+        self.lengths.pop()
+        self.midpoints.pop()
+        self.remeasure_walls([last - 1])
+
+    def bounds(self) -> tuple:  # left, top, right, bottom of the outline
+        xs = [point[0] for point in self.points]
+        ys = [point[1] for point in self.points]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def contains(self, point) -> bool:  # even-odd rule, same as furniture_store.points_in_polygon
+        x, y = point
+        inside = False
+        for ind, (x1, y1) in enumerate(self.points):
+            x2, y2 = self.points[self.next_index(ind)]
+            if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+        return inside
+
+    @property
+    def perimeter(self) -> float:  # world pixels
+        return self.total_length
+
+    @property
+    def area(self) -> float:  # square world pixels, the same whichever way round the vertices go
+        return abs(self.twice_area) / 2
@@ -0,0 +1,147 @@
+# Drawing-library-free scene model used by the Room Planner.
+# Desc: A Scene is one floor of a plan as plain numbers: room outlines and furniture boxes (type, center, size,
+#       angle), nothing from pygame or Tk. Frontends keep their own drawing objects and subscribe to the scene. Every
+#       add, change and removal is passed on as (event, item), so a renderer only touches what actually changed and
+#       never has to re-read the whole scene. The pygame planner can publish a floor into a scene as it's edited
+#       (Floor.publish in building.py), and a scene also loads from the plan files main.py saves (see plan_file.py),
+#       so whatever the pygame planner makes, another frontend can show.
+
+import math
+
+from plan_file import read_plan
+
+ADDED = 'added'
+CHANGED = 'changed'
+REMOVED = 'removed'
+RESTACKED = 'restacked'  # the item moved in the drawing order, see Scene.restack()
+CLEARED = 'cleared'  # sent once with item None, instead of one REMOVED per item
+
+ROOM = 'room'
+FURNITURE = 'furniture'
+
+
+class SceneItem:
+    __slots__ = ('key', 'kind', 'furn_type', 'x', 'y', 'width', 'height', 'angle', 'rotation_scale', 'points')
+
+    def __init__(self, key, kind, furn_type=None, center=(0, 0), size=(0, 0), angle=0, rotation_scale=None,
+                 points=()):
+        self.key = key  # unique within its scene, never reused, so frontends can key their own objects by it
+        self.kind = kind  # ROOM or FURNITURE
+        self.furn_type = furn_type
+        self.x, self.y = center
+        self.width, self.height = size
+        self.angle = angle  # degrees counterclockwise on screen, the same as Furniture.angle
+        self.rotation_scale = rotation_scale  # as saved by main.py, see Furniture.rotation_scale
+        self.points = list(points)  # a room's corners in order, empty for furniture
+
+    def corners(self) -> list:  # a room's outline, or a piece's turned box the way collision.box_corners() makes it
+        if self.kind == ROOM:
+            return self.points
+        cos_a = math.cos(math.radians(self.angle))
+        sin_a = math.sin(math.radians(self.angle))
+        half_width = self.width / 2
+        half_height = self.height / 2
+        return [(self.x + x * cos_a + y * sin_a, self.y - x * sin_a + y * cos_a)
+                for x, y in ((-half_width, -half_height), (half_width, -half_height), (half_width, half_height),
+                             (-half_width, half_height))]
+
+
+class Scene:
+    def __init__(self):
+        self.items = {}  # key -> SceneItem, in drawing order (dicts keep insertion order)
+        self.listeners = []
+        self.next_key = 1
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(list(self.items.values()))
+
+    def subscribe(self, listener) -> None:  # listener(event, item) is called after every change
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener) -> None:
+        self.listeners.remove(listener)
+
+    def notify(self, event, item) -> None:
+        for listener in self.listeners:
+            listener(event, item)
+
+    def add(self, kind, **fields) -> SceneItem:
+        item = SceneItem(self.next_key, kind, **fields)
+        self.next_key += 1
+        self.items[item.key] = item
+        self.notify(ADDED, item)
+        return item
+
+    def add_room(self, corners) -> SceneItem:
+        return self.add(ROOM, points=corners)
+
+    def add_furniture(self, furn_type, center, size, angle=0, rotation_scale=None) -> SceneItem:
+        return self.add(FURNITURE, furn_type=furn_type, center=center, size=size, angle=angle,
+                        rotation_scale=rotation_scale)
+
+    def update(self, item, **changes) -> None:  # e.g. update(item, x=10, y=20) or update(item, angle=90)
+        for name, value in changes.items():
+            setattr(item, name, value)
+        self.notify(CHANGED, item)
+
+    def move_to(self, item, center) -> None:
+        self.update(item, x=center[0], y=center[1])
+
+    def restack(self, item, under=None) -> None:
+        # moves item to just under the item under, or to the top if under is None. mostly a piece being brought to
+        # the top. putting one further down rebuilds the order, which only happens when undo restores a piece
+        del self.items[item.key]
+        if under is None:
+            self.items[item.key] = item
+        else:
+            items = list(self.items.items())
+            ind = next(num for num, (key, _) in enumerate(items) if key == under.key)
+            items.insert(ind, (item.key, item))
+            self.items = dict(items)
+        self.notify(RESTACKED, item)
+
+    def item_above(self, item):  # the item drawn right after item, or None if it's on top
+        if next(reversed(self.items)) == item.key:
+            return None
+        keys = list(self.items)
+        return self.items[keys[keys.index(item.key) + 1]]
+
+    def remove(self, item) -> None:
+        if self.items.pop(item.key, None) is not None:
+            self.notify(REMOVED, item)
+
+    def clear(self) -> None:
+        self.items.clear()
+        self.notify(CLEARED, None)
+
+
+def load_scene(path, floor_number=0, scene=None) -> Scene:  # one floor of a plan file, into scene if one is given
+    scene = Scene() if scene is None else scene
+    floor = -1
+    for kind, data in read_plan(path):
+        if kind == 'floor':
+            floor += 1
+        elif kind == 'room':
+            floor = max(floor, 0)  # a plan without floor records is one floor
+            if floor == floor_number:
+                scene.add_room(data)
+        elif kind == 'furniture' and floor == floor_number:
+            for furn_type, center_x, center_y, width, height, angle, rotation_scale in data:
+                scene.add_furniture(furn_type, (center_x, center_y), unturned_size(width, height, angle), angle,
+                                    rotation_scale)
+    return scene
+
+
+def unturned_size(width, height, angle) -> tuple:
+    # main.py saves a piece's rect, which for a turned piece is the box around its turned outline. this works the
+    # piece's own size back out of it. close to 45 degrees both sides weigh the same, so it's taken to be square
+    cos_a = abs(math.cos(math.radians(angle)))
+    sin_a = abs(math.sin(math.radians(angle)))
+    determinant = cos_a * cos_a - sin_a * sin_a
+    if abs(determinant) < 0.1:
+        side = (width + height) / 2 / (cos_a + sin_a)
+        return side, side
+    return ((width * cos_a - height * sin_a) / determinant, (height * cos_a - width * sin_a) / determinant)
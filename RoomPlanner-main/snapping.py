@@ -0,0 +1,113 @@
+# Snapping engine used by the Room Planner.
+# Desc: Keeps the x and y coordinates of everything that can be snapped to (vertices, furniture edges) in sorted
+#       lists, so the nearest alignment candidate for a dragged object is found with a bisect instead of a scan
+#       over every vertex. Entries are updated one at a time as things move, or all at once when a plan is loaded.
+
+from bisect import bisect_left, insort
+
+import numpy as np
+
+
+class AxisIndex:  # sorted (coordinate, key) pairs along one axis, where key is (owner, part)
+    def __init__(self):
+        self.entries = []
+        self.positions = {}  # key -> coordinate currently stored in entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def set(self, key, value) -> None:
+        old_value = self.positions.get(key)
+        if old_value == value:
+            return
+        if old_value is not None:
+            self.remove_entry(old_value, key)
+        insort(self.entries, (value, key))
+        self.positions[key] = value
+
+    def set_many(self, keys, values) -> None:
+        # set() for every key/value pair, with the whole axis re-sorted in one numpy pass instead of one insort per
+        # key, for loading thousands of pieces at once. the owner half of every key has to be an int
+        if self.positions:  # keys that were already here lose their old entries
+            self.positions.update(zip(keys, values))
+            keys = list(self.positions)
+            values = list(self.positions.values())
+        else:
+            self.positions = dict(zip(keys, values))
+        part_codes = {part: code for code, part in enumerate(sorted({key[1] for key in keys}))}
+        order = np.lexsort((np.array([part_codes[key[1]] for key in keys], dtype=np.int64),
+                            np.array([key[0] for key in keys], dtype=np.int64),
+                            np.array(values, dtype=float)))  # same order as sorting the (value, key) tuples
+        self.entries = [(values[i], keys[i]) for i in order.tolist()]
+
+    def discard(self, key) -> None:
+        old_value = self.positions.pop(key, None)
+        if old_value is not None:
+            self.remove_entry(old_value, key)
+
+    def remove_entry(self, value, key) -> None:
+        i = bisect_left(self.entries, (value, key))
+        del self.entries[i]
+
+    def nearest(self, value, tolerance, exclude=None):
+        # closest stored coordinate strictly less than tolerance away, ignoring entries owned by exclude.
+        # returns None if there isn't one
+        i = bisect_left(self.entries, (value,))
+        best = None
+        lower = i - 1
+        while lower >= 0 and value - self.entries[lower][0] < tolerance:
+            if self.entries[lower][1][0] != exclude:
+                best = self.entries[lower][0]
+                break
+            lower -= 1
+        upper = i
+        while upper < len(self.entries) and self.entries[upper][0] - value < tolerance:
+            if self.entries[upper][1][0] != exclude:
+                if best is None or self.entries[upper][0] - value < value - best:
+                    best = self.entries[upper][0]
+                break
+            upper += 1
+        return best
+
+
+class SnapIndex:  # an AxisIndex per axis, plus which keys each owner has so it can be removed in one go
+    def __init__(self):
+        self.x_axis = AxisIndex()
+        self.y_axis = AxisIndex()
+
+    def set_point(self, owner, x, y) -> None:
+        self.x_axis.set((owner, 'x'), x)
+        self.y_axis.set((owner, 'y'), y)
+
+    def set_rect(self, owner, rect) -> None:  # a rect contributes both of its vertical and horizontal edges
+        self.x_axis.set((owner, 'left'), rect.left)
+        self.x_axis.set((owner, 'right'), rect.right)
+        self.y_axis.set((owner, 'top'), rect.top)
+        self.y_axis.set((owner, 'bottom'), rect.bottom)
+
+    def set_rects(self, owners, rects) -> None:  # set_rect for many owners and their rects, sorted in bulk
+        self.x_axis.set_many([(owner, 'left') for owner in owners] + [(owner, 'right') for owner in owners],
+                             [rect.left for rect in rects] + [rect.right for rect in rects])
+        self.y_axis.set_many([(owner, 'top') for owner in owners] + [(owner, 'bottom') for owner in owners],
+                             [rect.top for rect in rects] + [rect.bottom for rect in rects])
+
+    def remove_point(self, owner) -> None:
+        self.x_axis.discard((owner, 'x'))
+        self.y_axis.discard((owner, 'y'))
+
+    def remove_rect(self, owner) -> None:
+        self.x_axis.discard((owner, 'left'))
+        self.x_axis.discard((owner, 'right'))
+        self.y_axis.discard((owner, 'top'))
+        self.y_axis.discard((owner, 'bottom'))
+
+
+def snap_offset(axes, values, tolerance, exclude=None) -> int:
+    # smallest shift that lines any of the values up with a coordinate in any of the axes, or 0 if none is close
+    best_offset = None
+    for axis in axes:
+        for value in values:
+            target = axis.nearest(value, tolerance, exclude)
+            if target is not None and (best_offset is None or abs(target - value) < abs(best_offset)):
+                best_offset = target - value
+    return 0 if best_offset is None else best_offset
@@ -0,0 +1,127 @@
+# Spatial index used by the Room Planner for click hit-testing.
+# Desc: A uniform grid that buckets rects into fixed-size cells, so "what is under the mouse?" only has to look at
+#       the handful of objects sharing the clicked cell instead of every vertex and furniture piece in the room.
+
+import numpy as np
+
+
+class SpatialGrid:
+    def __init__(self, cell_size: int = 100):
+        self.cell_size = cell_size
+        self.cells = {}  # (cell_x, cell_y) -> set of items touching that cell
+        self.items = {}  # item -> [(left, top, right, bottom), z, cell_range]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, item) -> bool:
+        return item in self.items
+
+    def cell_range(self, bounds) -> tuple:  # first and last cell (inclusive) covered by the bounds
+        left, top, right, bottom = bounds
+        return (left // self.cell_size, top // self.cell_size,
+                max(left, right - 1) // self.cell_size, max(top, bottom - 1) // self.cell_size)
+
+    def insert(self, item, rect, z) -> None:  # rect can be a pygame.Rect or anything with left/top/right/bottom
+        bounds = (rect.left, rect.top, rect.right, rect.bottom)
+        cell_range = self.cell_range(bounds)
+        self.items[item] = [bounds, z, cell_range]
+        self.add_to_cells(item, cell_range)
+
+    def insert_many(self, items, rects, zs) -> None:
+        # insert() for a whole batch, e.g. a loaded plan: numpy works out every (cell, item) pair and groups them by
+        # cell, so each cell's set is filled in one go instead of one set.add per item per cell
+        if not items:
+            return
+        bounds = np.array([(rect.left, rect.top, rect.right, rect.bottom) for rect in rects], dtype=np.int64)
+        first_x = bounds[:, 0] // self.cell_size
+        first_y = bounds[:, 1] // self.cell_size
+        last_x = np.maximum(bounds[:, 0], bounds[:, 2] - 1) // self.cell_size
+        last_y = np.maximum(bounds[:, 1], bounds[:, 3] - 1) // self.cell_size
+        cell_ranges = zip(first_x.tolist(), first_y.tolist(), last_x.tolist(), last_y.tolist())
+        for item, item_bounds, z, cell_range in zip(items, map(tuple, bounds.tolist()), zs, cell_ranges):
+            self.items[item] = [item_bounds, z, cell_range]
+
+        heights = last_y - first_y + 1
+        counts = (last_x - first_x + 1) * heights
+        owners = np.repeat(np.arange(len(items)), counts)
+        offsets = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell_x = first_x[owners] + offsets // heights[owners]
+        cell_y = first_y[owners] + offsets % heights[owners]
+        order = np.lexsort((cell_y, cell_x))
+        cell_x, cell_y, owners = cell_x[order], cell_y[order], owners[order]
+        starts = np.flatnonzero(np.r_[True, (np.diff(cell_x) != 0) | (np.diff(cell_y) != 0)])
+        ends = np.r_[starts[1:], len(owners)]
+        members = [items[owner] for owner in owners.tolist()]
+        for start, end, key in zip(starts.tolist(), ends.tolist(), zip(cell_x[starts].tolist(),
+                                                                         cell_y[starts].tolist())):
+            cell = self.cells.get(key)
+            if cell is None:
+                self.cells[key] = set(members[start:end])
+            else:
+                cell.update(members[start:end])
+
+    def remove(self, item) -> None:
+        entry = self.items.pop(item, None)
+        if entry is not None:
+            self.remove_from_cells(item, entry[2])
+
+    def update(self, item, rect) -> None:  # call after the item moves or is resized
+        entry = self.items[item]
+        entry[0] = (rect.left, rect.top, rect.right, rect.bottom)
+        cell_range = self.cell_range(entry[0])
+        if cell_range != entry[2]:  # small moves usually stay inside the same cells, so skip the re-bucketing
+            self.remove_from_cells(item, entry[2])
+            self.add_to_cells(item, cell_range)
+            entry[2] = cell_range
+
+    def set_z(self, item, z) -> None:
+        self.items[item][1] = z
+
+    def z_of(self, item) -> int:
+        return self.items[item][1]
+
+    def topmost_at(self, pos):  # returns the highest-z item whose rect contains pos, or None
+        x, y = pos
+        best_item = None
+        best_z = None
+        for item in self.cells.get((x // self.cell_size, y // self.cell_size), ()):
+            (left, top, right, bottom), z, _ = self.items[item]
+            if left <= x < right and top <= y < bottom and (best_z is None or z > best_z):
+                best_item = item
+                best_z = z
+        return best_item
+
+    def query(self, rect) -> list:  # (z, item) for every item whose rect overlaps rect, sorted bottom to top
+        bounds = (rect.left, rect.top, rect.right, rect.bottom)
+        first_x, first_y, last_x, last_y = self.cell_range(bounds)
+        if (last_x - first_x + 1) * (last_y - first_y + 1) >= len(self.cells):
+            candidates = self.items  # rect covers more cells than are in use, so just look at everything
+        else:
+            candidates = set()
+            for cell_x in range(first_x, last_x + 1):
+                for cell_y in range(first_y, last_y + 1):
+                    candidates.update(self.cells.get((cell_x, cell_y), ()))
+        found = []
+        for item in candidates:
+            (left, top, right, bottom), z, _ = self.items[item]
+            if left < bounds[2] and bounds[0] < right and top < bounds[3] and bounds[1] < bottom:
+                found.append((z, item))
+        found.sort(key=lambda entry: entry[0])
+        return found
+
+    def add_to_cells(self, item, cell_range) -> None:
+        first_x, first_y, last_x, last_y = cell_range
+        for cell_x in range(first_x, last_x + 1):
+            for cell_y in range(first_y, last_y + 1):
+                self.cells.setdefault((cell_x, cell_y), set()).add(item)
+
+    def remove_from_cells(self, item, cell_range) -> None:
+        first_x, first_y, last_x, last_y = cell_range
+        for cell_x in range(first_x, last_x + 1):
+            for cell_y in range(first_y, last_y + 1):
+                cell = self.cells.get((cell_x, cell_y))
+                if cell is not None:
+                    cell.discard(item)
+                    if not cell:
+                        del self.cells[(cell_x, cell_y)]
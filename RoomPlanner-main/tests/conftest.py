@@ -0,0 +1,8 @@
+# Shared test setup used by the Room Planner's tests.
+# Desc: The planner's modules import each other by bare name (they're run from RoomPlanner-main), so the tests put
+#       that folder on the path the same way.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
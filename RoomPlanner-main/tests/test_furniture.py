@@ -0,0 +1,40 @@
+# Tests for furniture pieces used by the Room Planner (Furniture in main.py).
+
+import pytest
+
+import main as planner
+
+
+@pytest.fixture(scope='module', autouse=True)
+def display():  # sprites are converted for the display, so they need one, even a hidden one
+    planner.init_display(headless=True)
+
+
+def rounded(size) -> tuple:
+    return tuple(round(side, 6) for side in size)
+
+
+@pytest.mark.parametrize('angle, mouse', [(90, (0, -300)), (0, (300, 0)), (180, (-300, 0)), (-90, (0, 300))])
+def test_resize_after_a_right_angle_rotation_keeps_the_outline_in_step(angle, mouse):
+    piece = planner.Furniture('Bed', center=(500, 500))
+    piece.rotate_furniture((500 + mouse[0], 500 + mouse[1]))
+    assert piece.angle == angle and piece.rotation_scale is not None
+
+    for _ in range(4):  # a drag on the width button, then the height button
+        piece.scale_furn_width((10, 0), preview=True)
+    for _ in range(3):
+        piece.scale_furn_height((0, -5), preview=True)
+    previewed = rounded(piece.size())
+    turned = angle in (90, -90)
+    assert previewed == ((piece.rect.height, piece.rect.width) if turned else piece.rect.size)
+
+    piece.finish_transform()
+    assert rounded(piece.size()) == previewed
+
+
+def test_rotate_preview_outline_follows_the_pending_scale():
+    piece = planner.Furniture('Desk', center=(500, 500))
+    piece.rotate_furniture((700, 350), preview=True)
+    previewed = rounded(piece.size())
+    piece.finish_transform()
+    assert rounded(piece.size()) == previewed
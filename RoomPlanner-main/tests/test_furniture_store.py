@@ -0,0 +1,41 @@
+# Tests for the array-backed layout checks used by the Room Planner (furniture_store.py).
+
+import pygame
+import pytest
+
+from furniture_store import FurnitureStore
+
+SQUARE_ROOM = [(0, 0), (100, 0), (100, 100), (0, 100)]
+L_SHAPED_ROOM = [(0, 0), (100, 0), (100, 50), (50, 50), (50, 100), (0, 100)]
+
+
+def store_of(*rects) -> FurnitureStore:
+    store = FurnitureStore()
+    for rect in rects:
+        store.add(rect, pygame.Rect(rect), 0, 0)
+    return store
+
+
+def outside(store, polygon) -> list:
+    return [store.items[row] for row in store.outside_polygon(polygon).tolist()]
+
+
+@pytest.mark.parametrize('rect', [(0, 40, 20, 20), (80, 40, 20, 20), (40, 0, 20, 20), (40, 80, 20, 20),
+                                  (0, 0, 20, 20), (80, 0, 20, 20), (80, 80, 20, 20), (0, 80, 20, 20)])
+def test_box_flush_against_a_wall_is_inside(rect):  # left, right, top and bottom walls, then the four corners
+    assert outside(store_of(rect), SQUARE_ROOM) == []
+
+
+def test_box_filling_the_whole_room_is_inside():
+    assert outside(store_of((0, 0, 100, 100)), SQUARE_ROOM) == []
+
+
+@pytest.mark.parametrize('rect', [(81, 40, 20, 20), (-1, 40, 20, 20), (40, -1, 20, 20), (40, 81, 20, 20)])
+def test_box_one_pixel_past_a_wall_is_outside(rect):
+    assert outside(store_of(rect), SQUARE_ROOM) == [rect]
+
+
+def test_box_flush_against_the_notch_of_an_l_shaped_room():
+    inside = [(30, 50, 20, 20), (50, 30, 20, 20), (0, 80, 50, 20), (80, 0, 20, 50)]
+    straddling = (40, 40, 20, 20)
+    assert outside(store_of(*inside, straddling), L_SHAPED_ROOM) == [straddling]
@@ -0,0 +1,153 @@
+# Tk canvas renderer used by the Room Planner's Tk frontend (../main.py).
+# Desc: Draws a Scene (scene.py) onto a tkinter Canvas, one tagged polygon per room or piece. Scene changes aren't
+#       drawn as they come in. They're collected, and the next idle cycle applies all of them at once, so a drag or a
+#       loaded plan costs one pass however many events it made. A changed item is updated in place with
+#       coords/itemconfigure, and only the options that differ are sent. Removed items are hidden and kept in a pool
+#       for the next new item, instead of being deleted and created again. That keeps the canvas's item count and
+#       its ids from growing with every edit, so it doesn't slow down over a long session.
+#       Scene coordinates are mapped to the canvas by a scale and offset, which fit_scene() can set so a plan from
+#       the pygame planner (whose rooms sit far from the origin) fits the canvas.
+
+from scene import CLEARED, REMOVED, RESTACKED, ROOM
+
+POOL_LIMIT = 4096  # hidden items kept for reuse, anything past this is deleted
+
+
+class CanvasRenderer:
+    def __init__(self, canvas, scene, item_style):
+        self.canvas = canvas
+        self.scene = scene
+        self.item_style = item_style  # scene item -> dict of canvas options (fill, outline, width)
+        self.canvas_ids = {}  # scene key -> canvas item id
+        self.keys = {}  # canvas item id -> scene key, for hit tests
+        self.drawn_styles = {}  # canvas item id -> the options it was last configured with
+        self.pool = []  # hidden canvas items ready to be reused
+        self.pending = {}  # scene key -> item to draw at the next idle, or None to take it off the canvas
+        self.cleared = False  # the whole scene went away since the last flush
+        self.restacked = {}  # scene key -> item whose place in the drawing order changed since the last flush
+        self.scale = 1.0  # canvas position = scene position * scale + offset
+        self.offset = (0.0, 0.0)
+        self.flush_id = None  # the after_idle callback, while one is waiting
+        scene.subscribe(self.scene_changed)
+        for item in scene:
+            self.scene_changed(None, item)
+
+    def scene_changed(self, event, item) -> None:  # the scene's listener, only records what needs doing
+        if event == CLEARED:
+            self.pending.clear()
+            self.restacked.clear()
+            self.cleared = True
+        elif event == REMOVED:
+            self.pending[item.key] = None
+            self.restacked.pop(item.key, None)
+        elif event == RESTACKED:
+            self.restacked[item.key] = item
+        else:
+            self.pending[item.key] = item
+        if self.flush_id is None:
+            self.flush_id = self.canvas.after_idle(self.flush)
+
+    def flush(self) -> None:  # applies every change made since the last flush
+        if self.flush_id is not None:
+            self.canvas.after_cancel(self.flush_id)  # a no-op when called from the idle callback itself
+            self.flush_id = None
+        if self.cleared:
+            self.cleared = False
+            for key in list(self.canvas_ids):
+                self.release(key)
+        pending = self.pending
+        self.pending = {}
+        for key, item in pending.items():
+            if item is None:
+                self.release(key)
+            else:
+                self.draw(item)
+        restacked = self.restacked
+        self.restacked = {}
+        if len(restacked) > 1:  # top to bottom, so the item each one goes under is already in its final place
+            restacked = {key: restacked[key] for key in reversed(self.scene.items) if key in restacked}
+        for key, item in restacked.items():  # after drawing, so whatever they go under is on the canvas
+            if key not in self.canvas_ids or item.kind == ROOM:
+                continue
+            above = self.scene.item_above(item)
+            if above is None:
+                self.canvas.tag_raise(self.canvas_ids[key])
+            elif above.key in self.canvas_ids:
+                self.canvas.tag_lower(self.canvas_ids[key], self.canvas_ids[above.key])
+
+    def draw(self, item) -> None:
+        coords = [value for x, y in item.corners() for value in self.to_canvas(x, y)]
+        style = self.item_style(item)
+        canvas_id = self.canvas_ids.get(item.key)
+        if canvas_id is not None:  # already on the canvas, just move/reshape it
+            self.canvas.coords(canvas_id, coords)
+            self.configure(canvas_id, style)
+            return
+        if self.pool:
+            canvas_id = self.pool.pop()
+            self.canvas.coords(canvas_id, coords)
+            self.configure(canvas_id, dict(style, state='normal', tags=('scene', item.kind)))
+            if item.kind != ROOM:
+                self.canvas.tag_raise(canvas_id)  # a reused item keeps its old place in the stacking order
+        else:
+            canvas_id = self.canvas.create_polygon(coords, tags=('scene', item.kind), **style)
+            self.drawn_styles[canvas_id] = dict(style, state='normal', tags=('scene', item.kind))
+        if item.kind == ROOM:
+            self.canvas.tag_lower(canvas_id)  # room outlines stay under the furniture
+        self.canvas_ids[item.key] = canvas_id
+        self.keys[canvas_id] = item.key
+
+    def configure(self, canvas_id, style) -> None:  # itemconfigure with only the options that changed
+        drawn = self.drawn_styles[canvas_id]
+        changes = {name: value for name, value in style.items() if drawn.get(name) != value}
+        if changes:
+            self.canvas.itemconfigure(canvas_id, **changes)
+            drawn.update(changes)
+
+    def release(self, key) -> None:  # takes a scene item's canvas item off screen, into the pool if there's room
+        canvas_id = self.canvas_ids.pop(key, None)
+        if canvas_id is None:
+            return
+        del self.keys[canvas_id]
+        if len(self.pool) < POOL_LIMIT:
+            self.configure(canvas_id, {'state': 'hidden', 'tags': ('pooled',)})
+            self.pool.append(canvas_id)
+        else:
+            self.canvas.delete(canvas_id)
+            del self.drawn_styles[canvas_id]
+
+    def to_canvas(self, x, y) -> tuple:
+        return x * self.scale + self.offset[0], y * self.scale + self.offset[1]
+
+    def to_scene(self, x, y) -> tuple:
+        return (x - self.offset[0]) / self.scale, (y - self.offset[1]) / self.scale
+
+    def set_view(self, scale, offset) -> None:  # redraws every item at the new scale and offset on the next flush
+        self.scale = scale
+        self.offset = offset
+        for item in self.scene:
+            self.scene_changed(None, item)
+
+    def fit_scene(self, margin=20) -> None:  # scales and centers everything in the scene to fill the canvas
+        points = [point for item in self.scene for point in item.corners()]
+        if not points:
+            self.set_view(1.0, (0.0, 0.0))
+            return
+        left = min(x for x, _ in points)
+        top = min(y for _, y in points)
+        width = max(max(x for x, _ in points) - left, 1)
+        height = max(max(y for _, y in points) - top, 1)
+        canvas_width = int(self.canvas.cget('width'))
+        canvas_height = int(self.canvas.cget('height'))
+        scale = min((canvas_width - margin * 2) / width, (canvas_height - margin * 2) / height)
+        self.set_view(scale, ((canvas_width - width * scale) / 2 - left * scale,
+                              (canvas_height - height * scale) / 2 - top * scale))
+
+    def item_at(self, x, y):  # the topmost scene item drawn at canvas position (x, y), or None
+        if self.pending or self.cleared:
+            self.flush()  # hit tests go by what's on the canvas, so bring it up to date first
+        for canvas_id in reversed(self.canvas.find_overlapping(x, y, x, y)):
+            key = self.keys.get(canvas_id)
+            if key is not None:
+                return self.scene.items.get(key)
+        return None
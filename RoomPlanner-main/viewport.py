@@ -0,0 +1,89 @@
+# Camera and sprite mipmaps used by the Room Planner.
+# Desc: The room is stored in world pixels (PIXELS_PER_INCH of them per inch). The Camera maps between world pixels
+#       and screen pixels so the plan can be panned and zoomed, and tells the drawing code which part of the world
+#       is on screen so everything else can be skipped. Zoom moves in fixed steps, which lets every furniture image
+#       keep one pre-scaled copy per step (its mipmaps) instead of being rescaled every frame.
+
+import math
+import weakref
+
+import pygame
+
+ZOOM_LEVELS = tuple(2 ** (step / 2) for step in range(-8, 5))  # 1/16x up to 4x in half-octave steps
+DEFAULT_ZOOM_INDEX = ZOOM_LEVELS.index(1)
+
+MIPMAPS = weakref.WeakKeyDictionary()  # source surface -> {zoom index: scaled copy}, dropped with the surface
+
+
+class Camera:
+    def __init__(self, view_rect):
+        self.view_rect = pygame.Rect(view_rect)  # the part of the screen the world is drawn into
+        self.offset_x = 0.0  # world position shown at the top left corner of the screen
+        self.offset_y = 0.0
+        self.zoom_index = DEFAULT_ZOOM_INDEX
+
+    @property
+    def zoom(self) -> float:
+        return ZOOM_LEVELS[self.zoom_index]
+
+    def reset(self) -> None:
+        self.offset_x = 0.0
+        self.offset_y = 0.0
+        self.zoom_index = DEFAULT_ZOOM_INDEX
+
+    def world_to_screen(self, pos) -> tuple:
+        return round((pos[0] - self.offset_x) * self.zoom), round((pos[1] - self.offset_y) * self.zoom)
+
+    def screen_to_world(self, pos) -> tuple:
+        return pos[0] / self.zoom + self.offset_x, pos[1] / self.zoom + self.offset_y
+
+    def world_rect_to_screen(self, rect) -> pygame.Rect:
+        left, top = self.world_to_screen(rect.topleft)
+        right, bottom = self.world_to_screen(rect.bottomright)
+        return pygame.Rect(left, top, max(1, right - left), max(1, bottom - top))
+
+    def visible_world_rect(self) -> pygame.Rect:  # world area covered by view_rect, rounded outwards
+        return self.screen_rect_to_world(self.view_rect)
+
+    def screen_rect_to_world(self, rect) -> pygame.Rect:  # rounded outwards, so it covers every pixel of rect
+        left, top = self.screen_to_world(rect.topleft)
+        right, bottom = self.screen_to_world(rect.bottomright)
+        return pygame.Rect(math.floor(left), math.floor(top),
+                           math.ceil(right) - math.floor(left) + 1, math.ceil(bottom) - math.floor(top) + 1)
+
+    def pan(self, screen_rel) -> None:  # drags the world along with the mouse
+        self.offset_x -= screen_rel[0] / self.zoom
+        self.offset_y -= screen_rel[1] / self.zoom
+
+    def fit(self, world_rect, screen_rect) -> None:  # largest zoom step that shows all of world_rect in screen_rect
+        self.zoom_index = 0
+        for zoom_index, zoom in enumerate(ZOOM_LEVELS):
+            if world_rect.width * zoom <= screen_rect.width and world_rect.height * zoom <= screen_rect.height:
+                self.zoom_index = zoom_index
+        self.offset_x = world_rect.centerx - screen_rect.centerx / self.zoom  # and centers it there
+        self.offset_y = world_rect.centery - screen_rect.centery / self.zoom
+
+    def zoom_at(self, screen_pos, steps) -> bool:  # zooms in/out by whole steps, keeping screen_pos over the same spot
+        zoom_index = min(len(ZOOM_LEVELS) - 1, max(0, self.zoom_index + steps))
+        if zoom_index == self.zoom_index:
+            return False
+        world_x, world_y = self.screen_to_world(screen_pos)
+        self.zoom_index = zoom_index
+        self.offset_x = world_x - screen_pos[0] / self.zoom
+        self.offset_y = world_y - screen_pos[1] / self.zoom
+        return True
+
+
+def mipmap(surface, zoom_index) -> pygame.Surface:
+    # the copy of surface to blit at this zoom step. each step is smoothscaled the first time it's needed and then
+    # kept for as long as the source surface is alive, so zooming doesn't rescale sprites every frame
+    zoom = ZOOM_LEVELS[zoom_index]
+    if zoom == 1:
+        return surface
+    levels = MIPMAPS.get(surface)
+    if levels is None:
+        levels = MIPMAPS[surface] = {}
+    if zoom_index not in levels:
+        size = (max(1, round(surface.get_width() * zoom)), max(1, round(surface.get_height() * zoom)))
+        levels[zoom_index] = pygame.transform.smoothscale(surface, size)
+    return levels[zoom_index]
@@ -1,5 +1,19 @@
+import os
+import sys
 import tkinter as tk
 
+# the scene model and canvas renderer are shared with the pygame planner and live next to it
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "RoomPlanner-main"))
+
+from scene import FURNITURE, Scene, load_scene
+from tk_renderer import CanvasRenderer
+
+# One entry per furniture option: (width, height) and fill color. Types from plans made in the pygame planner
+# that aren't listed here are drawn in PLAN_FURNITURE_COLOR at their saved size
+FURNITURE_STYLES = {"Chair": ((50, 50), "brown"), "Table": ((100, 50), "gray"), "Bed": ((150, 50), "blue")}
+PLACE_POSITIONS = {"Chair": (75, 75), "Table": (200, 175), "Bed": (375, 325)}  # centers used by "Place Furniture"
+PLAN_FURNITURE_COLOR = "light gray"
+
 
 class RoomDesigner:
     def __init__(self, master):
@@ -7,7 +21,11 @@ class RoomDesigner:
         self.master.title("Room Designer")
         self.canvas = tk.Canvas(master, width=600, height=400, bg="white")
         self.canvas.pack()
-        self.furniture_options = ["Chair", "Table", "Bed"]
+        self.scene = Scene()
+        self.renderer = CanvasRenderer(self.canvas, self.scene, self.item_style)
+        self.dragged_item = None  # the piece being moved with the mouse, and where it was grabbed
+        self.drag_offset = (0, 0)
+        self.furniture_options = list(FURNITURE_STYLES)
         self.selected_furniture = tk.StringVar()
         self.selected_furniture.set(self.furniture_options[0])
         self.floor_color = "white"  # Default floor color
@@ -31,28 +49,47 @@ class RoomDesigner:
 
         # Canvas bindings
         self.canvas.bind("<Button-1>", self.place_item)
+        self.canvas.bind("<B1-Motion>", self.drag_item)
+        self.canvas.bind("<ButtonRelease-1>", self.drop_item)
+
+    def item_style(self, item):  # canvas options for a scene item, used by the renderer
+        if item.kind == FURNITURE:
+            color = FURNITURE_STYLES[item.furn_type][1] if item.furn_type in FURNITURE_STYLES else PLAN_FURNITURE_COLOR
+            return {"fill": color, "outline": "black", "width": 1}
+        return {"fill": "", "outline": "black", "width": 3}
+
+    def add_furniture(self, furniture, center):
+        return self.scene.add_furniture(furniture, center, FURNITURE_STYLES[furniture][0])
 
     def place_furniture(self):
         furniture = self.selected_furniture.get()
-        if furniture == "Chair":
-            self.canvas.create_rectangle(50, 50, 100, 100, fill="brown")
-        elif furniture == "Table":
-            self.canvas.create_rectangle(150, 150, 250, 200, fill="gray")
-        elif furniture == "Bed":
-            self.canvas.create_rectangle(300, 300, 450, 350, fill="blue")
+        self.add_furniture(furniture, self.renderer.to_scene(*PLACE_POSITIONS[furniture]))
 
     def clear_all(self):
-        self.canvas.delete("all")
+        self.scene.clear()
+        self.renderer.set_view(1.0, (0.0, 0.0))
 
     def place_item(self, event):
-        x, y = event.x, event.y
-        furniture = self.selected_furniture.get()
-        if furniture == "Chair":
-            self.canvas.create_rectangle(x - 25, y - 25, x + 25, y + 25, fill="brown")
-        elif furniture == "Table":
-            self.canvas.create_rectangle(x - 50, y - 25, x + 50, y + 25, fill="gray")
-        elif furniture == "Bed":
-            self.canvas.create_rectangle(x - 75, y - 25, x + 75, y + 25, fill="blue")
+        # clicking a piece picks it up to be dragged, clicking anywhere else places the selected furniture there
+        pos = self.renderer.to_scene(event.x, event.y)
+        item = self.renderer.item_at(event.x, event.y)
+        if item is None or item.kind != FURNITURE:
+            item = self.add_furniture(self.selected_furniture.get(), pos)
+        self.dragged_item = item
+        self.drag_offset = (item.x - pos[0], item.y - pos[1])
+
+    def drag_item(self, event):
+        if self.dragged_item is not None:
+            pos = self.renderer.to_scene(event.x, event.y)
+            self.scene.move_to(self.dragged_item, (pos[0] + self.drag_offset[0], pos[1] + self.drag_offset[1]))
+
+    def drop_item(self, event):
+        self.dragged_item = None
+
+    def open_plan(self, path):  # the first floor of a plan saved by the pygame planner, in place of what's there
+        self.scene.clear()
+        load_scene(path, scene=self.scene)
+        self.renderer.fit_scene()  # pygame plans are in world pixels, far bigger than this canvas
 
     def change_floor_color(self, color):
         self.floor_color = color
@@ -62,6 +99,8 @@ class RoomDesigner:
 def main():
     root = tk.Tk()
     app = RoomDesigner(root)
+    if len(sys.argv) > 1:  # python main.py [plan file]
+        app.open_plan(sys.argv[1])
     root.mainloop()
 
 